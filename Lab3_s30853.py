@@ -2,6 +2,8 @@ import math
 import matplotlib.pyplot as plt
 import numpy as np
 
+from adaptive_rk import dormand_prince
+
 g = 10
 length = 1.0
 initial_angle = math.pi / 4
@@ -14,56 +16,78 @@ def accur(alpha, omega):
     epsilon = -(g / length) * np.sin(alpha)
     return omega, epsilon
 
-def euler_method(angle, velocity, time_step):
-    time = 0.0
-    time_values, angle_values, velocity_values = [time], [angle], [velocity]
-    for _ in range(steps):
+def ensemble_state(angle, velocity):
+    # scalars pass through; arrays of initial conditions are broadcast together and copied
+    # so the in-place updates in the methods below never touch the caller's data
+    if np.ndim(angle) == 0 and np.ndim(velocity) == 0:
+        return angle, velocity
+    angle, velocity = np.broadcast_arrays(np.asarray(angle, dtype=float), np.asarray(velocity, dtype=float))
+    return angle.copy(), velocity.copy()
+
+def allocate_history(angle, velocity, record_every):
+    n_records = steps // record_every + 1
+    time_values = np.empty(n_records)
+    angle_values, velocity_values = np.empty((2, n_records) + np.shape(angle))
+    time_values[0], angle_values[0], velocity_values[0] = 0.0, angle, velocity
+    return time_values, angle_values, velocity_values
+
+def euler_method(angle, velocity, time_step, record_every=1):
+    angle, velocity = ensemble_state(angle, velocity)
+    time_values, angle_values, velocity_values = allocate_history(angle, velocity, record_every)
+    for i in range(1, steps + 1):
         k1_omega, k1_epsilon = accur(angle, velocity)
         angle += k1_omega * time_step
         velocity += k1_epsilon * time_step
-        time += time_step
-        time_values.append(time)
-        angle_values.append(angle)
-        velocity_values.append(velocity)
+        if i % record_every == 0:
+            j = i // record_every
+            time_values[j], angle_values[j], velocity_values[j] = i * time_step, angle, velocity
     return time_values, angle_values, velocity_values, "Euler Method"
 
-def midpoint_method(angle, velocity, time_step):
-    time = 0.0
-    time_values, angle_values, velocity_values = [time], [angle], [velocity]
-    for _ in range(steps):
+def midpoint_method(angle, velocity, time_step, record_every=1):
+    angle, velocity = ensemble_state(angle, velocity)
+    time_values, angle_values, velocity_values = allocate_history(angle, velocity, record_every)
+    for i in range(1, steps + 1):
         k1_omega, k1_epsilon = accur(angle, velocity)
         mid_angle = angle + 0.5 * k1_omega * time_step
         mid_velocity = velocity + 0.5 * k1_epsilon * time_step
         k2_omega, k2_epsilon = accur(mid_angle, mid_velocity)
         angle += k2_omega * time_step
         velocity += k2_epsilon * time_step
-        time += time_step
-        time_values.append(time)
-        angle_values.append(angle)
-        velocity_values.append(velocity)
+        if i % record_every == 0:
+            j = i // record_every
+            time_values[j], angle_values[j], velocity_values[j] = i * time_step, angle, velocity
     return time_values, angle_values, velocity_values, "Midpoint Method"
 
-def rk4_method(angle, velocity, time_step):
-    time = 0.0
-    time_values, angle_values, velocity_values = [time], [angle], [velocity]
-    for _ in range(steps):
+def rk4_method(angle, velocity, time_step, record_every=1):
+    angle, velocity = ensemble_state(angle, velocity)
+    time_values, angle_values, velocity_values = allocate_history(angle, velocity, record_every)
+    for i in range(1, steps + 1):
         k1_omega, k1_epsilon = accur(angle, velocity)
         k2_omega, k2_epsilon = accur(angle + 0.5 * time_step * k1_omega, velocity + 0.5 * time_step * k1_epsilon)
         k3_omega, k3_epsilon = accur(angle + 0.5 * time_step * k2_omega, velocity + 0.5 * time_step * k2_epsilon)
         k4_omega, k4_epsilon = accur(angle + time_step * k3_omega, velocity + time_step * k3_epsilon)
         angle += (time_step / 6) * (k1_omega + 2 * k2_omega + 2 * k3_omega + k4_omega)
         velocity += (time_step / 6) * (k1_epsilon + 2 * k2_epsilon + 2 * k3_epsilon + k4_epsilon)
-        time += time_step
-        time_values.append(time)
-        angle_values.append(angle)
-        velocity_values.append(velocity)
+        if i % record_every == 0:
+            j = i // record_every
+            time_values[j], angle_values[j], velocity_values[j] = i * time_step, angle, velocity
     return time_values, angle_values, velocity_values, "Runge-Kutta 4 Method"
 
-def display_energy(time_values, angle_values, velocity_values, length, mass, method):
-    angle_values, velocity_values = np.array(angle_values), np.array(velocity_values)
+def rk45_method(angle, velocity, time_step, rtol=1e-8, atol=1e-10):
+    solution = dormand_prince(lambda t, y: np.array(accur(y[0], y[1])), (0.0, tmax), [angle, velocity],
+                              rtol=rtol, atol=atol, first_step=time_step)
+    return solution.t, solution.y[:, 0], solution.y[:, 1], "Dormand-Prince RK45 Method"
+
+def pendulum_energies(angle_values, velocity_values, length, mass):
     kinetic_energy = 0.5 * mass * (length * velocity_values) ** 2
     potential_energy = mass * g * length * (1 - np.cos(angle_values))
-    total_energy = kinetic_energy + potential_energy
+    return kinetic_energy, potential_energy, kinetic_energy + potential_energy
+
+def display_energy(time_values, angle_values, velocity_values, length, mass, method, energy_every=1):
+    time_values = np.asarray(time_values)[::energy_every]
+    angle_values = np.asarray(angle_values)[::energy_every]
+    velocity_values = np.asarray(velocity_values)[::energy_every]
+    kinetic_energy, potential_energy, total_energy = pendulum_energies(angle_values, velocity_values, length, mass)
     plt.plot(time_values, kinetic_energy, label=f'{method} - Kinetic Energy')
     plt.plot(time_values, potential_energy, label=f'{method} - Potential Energy')
     plt.plot(time_values, total_energy, label=f'{method} - Total Energy')
@@ -84,7 +108,7 @@ def draw_graph(angle_values, length, method):
 
 if __name__ == '__main__':
     mass = 1.0
-    methods = [euler_method, midpoint_method, rk4_method]
+    methods = [euler_method, midpoint_method, rk4_method, rk45_method]
     for method in methods:
         time_values, angle_values, velocity_values, method_name = method(initial_angle, initial_velocity, time_step)
         display_energy(time_values, angle_values, velocity_values, length, mass, method_name)
@@ -0,0 +1,131 @@
+import numpy as np
+
+# Dormand-Prince 5(4) tableau
+C = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1])
+A = [
+    np.array([]),
+    np.array([1 / 5]),
+    np.array([3 / 40, 9 / 40]),
+    np.array([44 / 45, -56 / 15, 32 / 9]),
+    np.array([19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729]),
+    np.array([9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656]),
+    np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84]),
+]
+B = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+# difference between the 5th and embedded 4th order weights
+E = np.array([71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40])
+# continuous extension: y(t_i + x h) = y_i + h * K^T P [x, x^2, x^3, x^4]
+P = np.array([
+    [1, -8048581381 / 2820520608, 8663915743 / 2820520608, -12715105075 / 11282082432],
+    [0, 0, 0, 0],
+    [0, 131558114200 / 32700410799, -68118460800 / 10900136933, 87487479700 / 32700410799],
+    [0, -1754552775 / 470086768, 14199869525 / 1410260304, -10690763975 / 1880347072],
+    [0, 127303824393 / 49829197408, -318862633887 / 49829197408, 701980252875 / 199316789632],
+    [0, -282668133 / 205662961, 2019193451 / 616988883, -1453857185 / 822651844],
+    [0, 40617522 / 29380423, -110615467 / 29380423, 69997945 / 29380423],
+])
+
+SAFETY = 0.9
+MIN_FACTOR = 0.2
+MAX_FACTOR = 10.0
+
+
+class RK45Solution:
+    def __init__(self, t, y, n_accepted, n_rejected, n_evals, interpolants=None):
+        self.t = t
+        self.y = y
+        self.n_accepted = n_accepted
+        self.n_rejected = n_rejected
+        self.n_evals = n_evals
+        self.interpolants = interpolants
+
+    def __call__(self, t_eval):
+        if self.interpolants is None:
+            raise ValueError("Dense output was not recorded, pass dense_output=True")
+        t_eval = np.asarray(t_eval, dtype=float)
+        # the step times decrease for a backward integration; search them in increasing order
+        direction = 1.0 if self.t[-1] >= self.t[0] else -1.0
+        idx = np.clip(np.searchsorted(direction * self.t, direction * t_eval, side="right") - 1, 0,
+                      len(self.t) - 2)
+        h = self.t[idx + 1] - self.t[idx]
+        x = (t_eval - self.t[idx]) / h
+        powers = np.cumprod(np.repeat(x[..., None], 4, axis=-1), axis=-1)
+        return self.y[idx] + h[..., None] * np.einsum("...ij,...j->...i", self.interpolants[idx], powers)
+
+
+def rms_norm(x):
+    return np.sqrt(np.mean(x ** 2))
+
+
+def initial_step(fun, t0, y0, f0, direction, rtol, atol):
+    scale = atol + rtol * np.abs(y0)
+    d0, d1 = rms_norm(y0 / scale), rms_norm(f0 / scale)
+    h0 = 1e-6 if d0 < 1e-5 or d1 < 1e-5 else 0.01 * d0 / d1
+    f1 = fun(t0 + direction * h0, y0 + direction * h0 * f0)
+    d2 = rms_norm((f1 - f0) / scale) / h0
+    if max(d1, d2) <= 1e-15:
+        h1 = max(1e-6, h0 * 1e-3)
+    else:
+        h1 = (0.01 / max(d1, d2)) ** (1 / 5)
+    return min(100 * h0, h1)
+
+
+def dormand_prince(
+        fun,
+        t_span: tuple[float, float],
+        y0,
+        rtol: float = 1e-6,
+        atol: float = 1e-9,
+        first_step: float | None = None,
+        max_step: float = np.inf,
+        dense_output: bool = False
+) -> RK45Solution:
+    # fun(t, y) -> dy/dt; every accepted step is recorded in the returned solution
+    t, t_end = map(float, t_span)
+    y = np.array(y0, dtype=float)
+    direction = 1.0 if t_end >= t else -1.0
+    K = np.empty((7, y.size))
+    K[0] = fun(t, y)
+    n_evals = 1
+    if first_step is None:
+        h = initial_step(fun, t, y, K[0], direction, rtol, atol)
+        n_evals += 1
+    else:
+        h = first_step
+    ts, ys, qs = [t], [y.copy()], []
+    n_accepted = n_rejected = 0
+
+    while direction * (t_end - t) > 0:
+        h = min(h, max_step, abs(t_end - t))
+        step_rejected = False
+        while True:
+            dt = direction * h
+            for s in range(1, 7):
+                K[s] = fun(t + C[s] * dt, y + dt * (A[s] @ K[:s]))
+            n_evals += 6
+            y_new = y + dt * (B @ K)
+            scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+            err = rms_norm(dt * (E @ K) / scale)
+            if err <= 1.0:
+                factor = MAX_FACTOR if err == 0 else min(MAX_FACTOR, SAFETY * err ** -0.2)
+                if step_rejected:
+                    factor = min(1.0, factor)
+                break
+            n_rejected += 1
+            step_rejected = True
+            h *= max(MIN_FACTOR, SAFETY * err ** -0.2)
+            if h < 10 * np.spacing(t):
+                raise RuntimeError(f"Step size underflow at t={t}")
+
+        if dense_output:
+            qs.append(K.T @ P)
+        t += dt
+        y = y_new
+        K[0] = K[6]
+        ts.append(t)
+        ys.append(y.copy())
+        n_accepted += 1
+        h *= factor
+
+    return RK45Solution(np.array(ts), np.array(ys), n_accepted, n_rejected, n_evals,
+                        np.array(qs) if dense_output else None)
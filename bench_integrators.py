@@ -0,0 +1,318 @@
+import argparse
+import json
+import math
+import os
+import time
+import tracemalloc
+import warnings
+from contextlib import contextmanager
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+import Lab3_s30853
+import psm02_s30069
+import psm03_s30069
+import psm04_s30069
+import psm06_s30069
+import psm08_s30069
+
+# every model is run at dt, dt/2, ... (LADDER_LEVELS values); the fine-dt RK4 reference
+# uses the smallest ladder dt divided by REFERENCE_REFINEMENT
+LADDER_LEVELS = 5
+REFERENCE_REFINEMENT = 16
+REPEATS = 3
+# a run counts as a regression when it is this much slower than the baseline
+REGRESSION_FACTOR = 1.25
+# smallest error drawn on the work-precision plots
+ERROR_FLOOR = 1e-16
+
+
+@contextmanager
+def module_settings(module, **values):
+    # several models read their step size / step count from module globals
+    saved = {name: getattr(module, name) for name in values}
+    for name, value in values.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+
+def step_count(t_end, dt):
+    return max(1, int(round(t_end / dt)))
+
+
+# psm02: projectile with linear drag, compared with the closed-form solution
+
+PROJECTILE = {"k": 1.0, "m": 2.0, "vx": 30.0, "vy": 40.0, "t_end": 4.0}
+
+
+def run_projectile(method, dt):
+    p = PROJECTILE
+    steps = step_count(p["t_end"], dt)
+    xs, ys, _, _ = psm02_s30069.simulate_batch(p["k"], p["m"], p["vx"], p["vy"], steps * dt, steps,
+                                               method, record_every=steps, stop_at_ground=False)
+    return steps, steps * dt, np.array([xs[-1], ys[-1]])
+
+
+def projectile_reference(t):
+    p = PROJECTILE
+    x, y, _, _ = psm02_s30069.analytic_state(p["k"], p["m"], p["vx"], p["vy"], t)
+    return np.array([x, y])
+
+
+# psm03 / Lab3: nonlinear pendulum, compared with fine-dt RK4
+
+PENDULUM = {"angle": math.pi / 4, "velocity": 0.0, "t_end": 10.0}
+PSM03_METHODS = {
+    "euler": psm03_s30069.euler_integration,
+    "midpoint": psm03_s30069.midpoint_integration,
+    "rk4": psm03_s30069.rk4_integration,
+    "leapfrog": psm03_s30069.leapfrog_integration,
+    "yoshida4": psm03_s30069.yoshida4_integration,
+}
+LAB3_METHODS = {
+    "euler": Lab3_s30853.euler_method,
+    "midpoint": Lab3_s30853.midpoint_method,
+    "rk4": Lab3_s30853.rk4_method,
+}
+
+
+def run_psm03(method, dt):
+    steps = step_count(PENDULUM["t_end"], dt)
+    with module_settings(psm03_s30069, dt=dt, num_steps=steps):
+        _, a_vals, v_vals = psm03_s30069.run_simulation(PSM03_METHODS[method], PENDULUM["angle"],
+                                                        PENDULUM["velocity"], record_every=steps)
+    return steps, steps * dt, np.array([a_vals[-1], v_vals[-1]])
+
+
+def run_lab3(method, dt):
+    steps = step_count(PENDULUM["t_end"], dt)
+    with module_settings(Lab3_s30853, steps=steps):
+        _, a_vals, v_vals, _ = LAB3_METHODS[method](PENDULUM["angle"], PENDULUM["velocity"], dt,
+                                                    record_every=steps)
+    return steps, steps * dt, np.array([a_vals[-1], v_vals[-1]])
+
+
+# psm04: rolling body on an incline, compared with RollingSimulation.evaluate_analytic
+
+ROLLING = {"mass": 1.0, "height": 10.0, "radius": 0.5, "alpha": math.radians(30), "t_end": 2.0,
+           "shape": "sphere"}
+
+
+def rolling_simulation(method, steps, t_end):
+    r = ROLLING
+    return psm04_s30069.RollingSimulation(r["mass"], r["height"], r["radius"], r["alpha"], t_end, steps,
+                                          r["shape"], method, record_every=steps)
+
+
+def run_rolling(method, dt):
+    steps = step_count(ROLLING["t_end"], dt)
+    # the last entry of run() is the state after all steps, i.e. at t = steps * dt
+    _, x, y, _, _, _ = rolling_simulation(method, steps, steps * dt).run()
+    return steps, steps * dt, np.array([x[-1], y[-1]])
+
+
+def rolling_reference(t):
+    _, _, _, _, x, y, _, _, _ = rolling_simulation("analytic", 1, ROLLING["t_end"]).evaluate_analytic(t)
+    return np.array([x, y])
+
+
+# psm06: string with fixed ends; the initial sine is an eigenvector of the discrete Laplacian,
+# so the semi-discrete solution is that shape times cos(omega t)
+
+WAVE = {"length": math.pi, "segments": 50, "speed": 1.0, "amp": 1.0, "t_end": 2.0}
+
+
+def wave_params(dt, t_end):
+    w = WAVE
+    return psm06_s30069.WaveParams(w["length"], w["segments"], w["speed"], dt, t_end, w["amp"])
+
+
+def run_wave(method, dt):
+    steps = step_count(WAVE["t_end"], dt)
+    state = psm06_s30069.simulate_final_state(wave_params(dt, steps * dt))
+    return steps, state.time, state.disp
+
+
+def wave_reference(t):
+    params = wave_params(1.0, t)
+    dx = params.spacing()
+    omega = 2 * params.speed / dx * math.sin(math.pi * dx / (2 * params.length))
+    return psm06_s30069.init_wave(params).disp * math.cos(omega * t)
+
+
+# psm08: Lorenz system over a horizon short enough for trajectories to stay comparable
+
+LORENZ = {"A": 10.0, "B": 28.0, "C": 8.0 / 3.0, "initial": [1.0, 1.0, 1.0], "t_end": 2.0}
+LORENZ_METHODS = {
+    "euler": psm08_s30069.euler_step,
+    "midpoint": psm08_s30069.midpoint_step,
+    "rk4": psm08_s30069.rk4_step,
+}
+
+
+def run_lorenz(method, dt):
+    p = LORENZ
+    steps = step_count(p["t_end"], dt)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        x, z = psm08_s30069.simulate(LORENZ_METHODS[method], p["initial"], dt, steps, p["A"], p["B"], p["C"])
+    return steps, steps * dt, np.array([x[-1], z[-1]])
+
+
+# name -> (runner(method, dt) -> (steps, t_final, final state), methods, largest dt,
+#          analytic reference(t) or None to use fine-dt RK4)
+MODELS = {
+    "psm02": (run_projectile, ("euler", "midpoint"), 0.05, projectile_reference),
+    "psm03": (run_psm03, tuple(PSM03_METHODS), 0.04, None),
+    "psm04": (run_rolling, ("euler", "midpoint"), 0.05, rolling_reference),
+    "psm06": (run_wave, ("midpoint",), 0.02, wave_reference),
+    "psm08": (run_lorenz, tuple(LORENZ_METHODS), 0.01, None),
+    "Lab3": (run_lab3, tuple(LAB3_METHODS), 0.04, None),
+}
+
+
+def dt_ladder(largest, levels=LADDER_LEVELS):
+    return [largest / 2 ** i for i in range(levels)]
+
+
+def measure(runner, method, dt, repeats=REPEATS):
+    # best-of-repeats wall time, then one extra run under tracemalloc for the peak allocation
+    best = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        steps, t_final, state = runner(method, dt)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        runner(method, dt)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return steps, t_final, state, best, peak
+
+
+def benchmark_model(name, levels=LADDER_LEVELS, repeats=REPEATS):
+    runner, methods, largest, reference = MODELS[name]
+    ladder = dt_ladder(largest, levels)
+    if reference is None:
+        fine_dt = ladder[-1] / REFERENCE_REFINEMENT
+        _, t_ref, state_ref = runner("rk4", fine_dt)
+        reference_name = f"rk4 dt={fine_dt:.3g}"
+    else:
+        reference_name = "analytic"
+
+    records = []
+    for method in methods:
+        for dt in ladder:
+            steps, t_final, state, wall, peak = measure(runner, method, dt, repeats)
+            if reference is None and not math.isclose(t_final, t_ref, rel_tol=1e-12):
+                # the ladder run and the fine RK4 run must end at the same time to be comparable
+                raise ValueError(f"{name}/{method} dt={dt:.3g} ends at t={t_final!r}, "
+                                 f"the reference at t={t_ref!r}")
+            exact = reference(t_final) if reference is not None else state_ref
+            error = float(np.max(np.abs(state - exact)))
+            records.append({
+                "model": name,
+                "method": method,
+                "dt": dt,
+                "steps": steps,
+                "wall_time": wall,
+                "steps_per_second": steps / wall if wall > 0 else math.inf,
+                "peak_memory": peak,
+                "error": error if math.isfinite(error) else None,
+                "reference": reference_name,
+            })
+    return records
+
+
+def run_benchmarks(models=None, levels=LADDER_LEVELS, repeats=REPEATS):
+    records = []
+    for name in models or MODELS:
+        print(f"Benchmarking {name}...")
+        records.extend(benchmark_model(name, levels, repeats))
+    return records
+
+
+def find_regressions(records, baseline, factor=REGRESSION_FACTOR):
+    # runs (matched on model, method and dt) whose wall time grew by more than factor
+    previous = {(r["model"], r["method"], r["dt"]): r for r in baseline}
+    slower = []
+    for r in records:
+        old = previous.get((r["model"], r["method"], r["dt"]))
+        if old is not None and r["wall_time"] > factor * old["wall_time"]:
+            slower.append((r, old))
+    return slower
+
+
+def plot_work_precision(records, directory):
+    # one figure per model: error against wall time, one line per method along the dt ladder
+    paths = []
+    for name in dict.fromkeys(r["model"] for r in records):
+        plt.figure(figsize=(7, 5))
+        model_records = [r for r in records if r["model"] == name]
+        for method in dict.fromkeys(r["method"] for r in model_records):
+            # errors at round-off can be exactly 0; keep them on the log axis at the floor
+            runs = [r for r in model_records if r["method"] == method and r["error"] is not None]
+            plt.loglog([r["wall_time"] for r in runs], [max(r["error"], ERROR_FLOOR) for r in runs],
+                       marker='o', label=method)
+        plt.xlabel("wall time (s)")
+        plt.ylabel(f"max abs error vs {model_records[0]['reference']}")
+        plt.title(f"{name} work-precision")
+        plt.grid(True, which="both", alpha=0.3)
+        plt.legend()
+        path = os.path.join(directory, f"work_precision_{name}.png")
+        plt.savefig(path, dpi=120, bbox_inches="tight")
+        plt.close()
+        paths.append(path)
+    return paths
+
+
+def print_summary(records):
+    print(f"{'model':<7}{'method':<10}{'dt':>11}{'steps':>9}{'time (s)':>11}{'steps/s':>12}"
+          f"{'peak KiB':>10}{'error':>11}")
+    for r in records:
+        error = f"{r['error']:.3e}" if r["error"] is not None else "diverged"
+        print(f"{r['model']:<7}{r['method']:<10}{r['dt']:>11.3e}{r['steps']:>9}{r['wall_time']:>11.4f}"
+              f"{r['steps_per_second']:>12.0f}{r['peak_memory'] / 1024:>10.1f}{error:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy/throughput benchmark of the simulation integrators")
+    parser.add_argument("--models", nargs="+", choices=tuple(MODELS), help="models to run (default: all)")
+    parser.add_argument("--levels", type=int, default=LADDER_LEVELS, help="number of dt halvings")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="timing repeats per run")
+    parser.add_argument("--output", default="benchmark_results", help="directory for the JSON and plots")
+    parser.add_argument("--baseline", help="earlier results JSON to check for slowdowns")
+    args = parser.parse_args()
+
+    records = run_benchmarks(args.models, args.levels, args.repeats)
+    os.makedirs(args.output, exist_ok=True)
+    json_path = os.path.join(args.output, "results.json")
+    with open(json_path, "w") as f:
+        json.dump(records, f, indent=2)
+    print_summary(records)
+    print(f"Results written to {json_path}")
+    for path in plot_work_precision(records, args.output):
+        print(f"Plot written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = find_regressions(records, json.load(f))
+        for r, old in slower:
+            print(f"REGRESSION {r['model']}/{r['method']} dt={r['dt']:.3e}: "
+                  f"{old['wall_time']:.4f}s -> {r['wall_time']:.4f}s")
+        if slower:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import numpy as np
+
+NBODY_SOLVERS = ("direct", "barnes_hut")
+# upper bound on pairwise distance entries held in memory at once by the direct kernel
+DIRECT_BLOCK_PAIRS = 1 << 22
+BH_MAX_DEPTH = 64
+
+
+def pack_state(positions, velocities):
+    # flat state laid out per body as [position, velocity], the same layout psm05 uses
+    return np.hstack((positions, velocities)).ravel()
+
+
+def unpack_state(state, n_bodies):
+    bodies = state.reshape(n_bodies, -1)
+    dim = bodies.shape[1] // 2
+    return bodies[:, :dim], bodies[:, dim:]
+
+
+def direct_accelerations(positions, masses, G, softening=0.0):
+    n = len(masses)
+    acc = np.empty_like(positions)
+    block = max(1, DIRECT_BLOCK_PAIRS // n)
+    for start in range(0, n, block):
+        d = positions[None, :, :] - positions[start:start + block, None, :]
+        r2 = np.einsum('ijk,ijk->ij', d, d) + softening ** 2
+        with np.errstate(divide='ignore'):
+            inv_r3 = r2 ** -1.5
+        # self-interaction (and coincident bodies without softening) contribute nothing
+        inv_r3[r2 == 0] = 0.0
+        acc[start:start + block] = G * np.einsum('ij,ijk->ik', inv_r3 * masses, d)
+    return acc
+
+
+def build_tree(positions, masses, max_depth=BH_MAX_DEPTH):
+    # quadtree/octree built one level at a time: every node holding more than one body is split
+    # and its bodies move into 2^dim children. Returns per-node arrays and each body's leaf.
+    n, dim = positions.shape
+    n_children = 2 ** dim
+    bits = 1 << np.arange(dim)
+    lo, hi = positions.min(axis=0), positions.max(axis=0)
+    center = ((lo + hi) / 2)[None]
+    half = np.array([max((hi - lo).max() / 2, np.finfo(float).tiny)])
+    mass = np.array([masses.sum()])
+    moment = (masses @ positions)[None]
+    children = np.full((1, n_children), -1)
+    node_of = np.zeros(n, dtype=int)
+
+    for _ in range(max_depth):
+        counts = np.bincount(node_of, minlength=len(mass))
+        movers = np.flatnonzero(counts[node_of] > 1)
+        if movers.size == 0:
+            break
+        parent = node_of[movers]
+        octant = (positions[movers] > center[parent]).astype(int) @ bits
+        keys, local = np.unique(parent * n_children + octant, return_inverse=True)
+        first, n_new = len(mass), len(keys)
+        key_parent, key_octant = keys // n_children, keys % n_children
+        signs = np.where(key_octant[:, None] & bits, 1.0, -1.0)
+        child_half = half[key_parent] / 2
+
+        children = np.vstack((children, np.full((n_new, n_children), -1)))
+        children[key_parent, key_octant] = first + np.arange(n_new)
+        center = np.vstack((center, center[key_parent] + signs * child_half[:, None]))
+        half = np.concatenate((half, child_half))
+        mover_mass = masses[movers]
+        mass = np.concatenate((mass, np.bincount(local, mover_mass, n_new)))
+        moment = np.vstack((moment, np.stack(
+            [np.bincount(local, mover_mass * positions[movers, k], n_new) for k in range(dim)], axis=1)))
+        node_of[movers] = first + local
+
+    safe_mass = np.where(mass > 0, mass, 1.0)[:, None]
+    com = np.where(mass[:, None] > 0, moment / safe_mass, center)
+    leaf = (children < 0).all(axis=1)
+    return half, mass, com, children, leaf, node_of
+
+
+def barnes_hut_accelerations(positions, masses, G, theta=0.5, softening=0.0):
+    # all bodies walk the tree together: each pass evaluates (body, node) pairs in bulk, accepting
+    # leaves and nodes with width / distance < theta and opening the rest into their children
+    n, dim = positions.shape
+    half, mass, com, children, leaf, node_of = build_tree(positions, masses)
+    acc = np.zeros_like(positions)
+    body = np.arange(n)
+    node = np.zeros(n, dtype=int)
+
+    while body.size:
+        m = mass[node]
+        c = com[node]
+        own = node == node_of[body]
+        if own.any():
+            # the body's own leaf: remove its contribution from the node's mass and centre of mass
+            own_mass = masses[body[own]]
+            rest = m[own] - own_mass
+            c[own] = (m[own, None] * c[own] - own_mass[:, None] * positions[body[own]]) / \
+                np.where(rest > 0, rest, 1.0)[:, None]
+            m[own] = rest
+        d = c - positions[body]
+        r2 = np.einsum('ij,ij->i', d, d) + softening ** 2
+        accept = leaf[node] | ((2 * half[node]) ** 2 < theta ** 2 * r2)
+
+        use = accept & (m > 0) & (r2 > 0)
+        coeff = G * m[use] / r2[use] ** 1.5
+        for k in range(dim):
+            acc[:, k] += np.bincount(body[use], coeff * d[use, k], n)
+
+        opened = children[node[~accept]]
+        valid = opened >= 0
+        body = np.repeat(body[~accept], valid.sum(axis=1))
+        node = opened[valid]
+
+    return acc
+
+
+def calculate_nbody_accelerations(positions, t, G, masses, solver="direct", theta=0.5, softening=0.0):
+    if solver == "direct":
+        return direct_accelerations(positions, masses, G, softening)
+    if solver == "barnes_hut":
+        return barnes_hut_accelerations(positions, masses, G, theta, softening)
+    raise ValueError(f"Unknown N-body solver '{solver}', expected one of {NBODY_SOLVERS}")
+
+
+def calculate_nbody_derivatives(state, t, G, masses, solver="direct", theta=0.5, softening=0.0):
+    positions, velocities = unpack_state(state, len(masses))
+    acc = calculate_nbody_accelerations(positions, t, G, masses, solver, theta, softening)
+    return pack_state(velocities, acc)
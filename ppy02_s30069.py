@@ -1,4 +1,13 @@
+import ast
+import csv
+import itertools
 import math
+import operator
+import random
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
 sales_data = {
     'Product A': [100, 200, 300],
@@ -9,30 +18,141 @@ sales_data = {
 
 # 1
 
+SALES_CHUNK_ROWS = 65536
+
+
+class SalesAggregate:
+    # per-product count, total and maximum, updated one columnar chunk at a time so memory is
+    # bounded by the chunk size and the number of distinct products. With exact=True the amounts
+    # keep their Python types (object columns), so integer totals stay exact ints
+    def __init__(self, exact=False):
+        self.index = {}
+        self.products = []
+        self.dtype = object if exact else float
+        self.count = np.zeros(0, dtype=np.int64)
+        self.total = np.zeros(0, dtype=self.dtype)
+        self.maximum = np.zeros(0, dtype=self.dtype)
+
+    def codes(self, names):
+        # global product index of every unique name in the chunk, registering new products
+        for name in names:
+            if name not in self.index:
+                self.index[name] = len(self.products)
+                self.products.append(name)
+        grow = len(self.products) - len(self.total)
+        if grow:
+            self.count = np.concatenate((self.count, np.zeros(grow, dtype=np.int64)))
+            self.total = np.concatenate((self.total, np.zeros(grow, dtype=self.dtype)))
+            self.maximum = np.concatenate((self.maximum, np.full(grow, -np.inf, dtype=self.dtype)))
+        return np.fromiter((self.index[name] for name in names), dtype=np.int64, count=len(names))
+
+    def update(self, products, amounts):
+        products = np.asarray(products)
+        amounts = np.asarray(amounts, dtype=self.dtype)
+        if products.size == 0:
+            return self
+        names, local = np.unique(products, return_inverse=True)
+        codes = self.codes(names.tolist())
+        # group-by within the chunk: sort by product, then reduce each run
+        order = np.argsort(local, kind='stable')
+        starts = np.flatnonzero(np.r_[True, np.diff(local[order]) != 0])
+        self.count[codes] += np.bincount(local, minlength=len(names))
+        if self.dtype is object:
+            self.total[codes] += np.add.reduceat(amounts[order], starts)
+        else:
+            self.total[codes] += np.bincount(local, amounts, len(names))
+        np.maximum.at(self.maximum, codes, np.maximum.reduceat(amounts[order], starts))
+        return self
+
+    def totals(self):
+        return dict(zip(self.products, self.total.tolist()))
+
+    def maxima(self):
+        # None for a product registered without any sales
+        return {name: value if count else None
+                for name, value, count in zip(self.products, self.maximum.tolist(), self.count.tolist())}
+
+    def top_k(self, k):
+        # the k products with the largest totals, largest first
+        k = min(k, len(self.products))
+        if k <= 0:
+            return []
+        best = np.argpartition(-self.total, k - 1)[:k]
+        best = best[np.argsort(-self.total[best], kind='stable')]
+        return [(self.products[i], total) for i, total in zip(best.tolist(), self.total[best].tolist())]
+
+
+def record_chunks(records, chunk_rows=SALES_CHUNK_ROWS):
+    # (product, amount) records from any iterable, regrouped into columnar chunks
+    products, amounts = [], []
+    for product, amount in records:
+        products.append(product)
+        amounts.append(amount)
+        if len(products) == chunk_rows:
+            yield products, amounts
+            products, amounts = [], []
+    if products:
+        yield products, amounts
+
+
+def csv_chunks(path, product_column='product', amount_column='amount', chunk_rows=SALES_CHUNK_ROWS):
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        for name in (product_column, amount_column):
+            if name not in header:
+                raise ValueError(f"Column '{name}' not found in {path}")
+        p, a = header.index(product_column), header.index(amount_column)
+        yield from record_chunks(((row[p], float(row[a])) for row in reader), chunk_rows)
+
+
+def aggregate_sales(source, chunk_rows=SALES_CHUNK_ROWS):
+    # source may be a CSV path, a {product: [amounts]} mapping, an iterable of
+    # (products, amounts) column chunks (e.g. record batches), or an iterable of
+    # (product, amount) records
+    aggregate = SalesAggregate()
+    if isinstance(source, str):
+        chunks = csv_chunks(source, chunk_rows=chunk_rows)
+    elif isinstance(source, dict):
+        # the in-memory mapping is aggregated exactly, like summing its lists in Python; every
+        # product is listed, even one without sales (total 0, no maximum)
+        aggregate = SalesAggregate(exact=True)
+        aggregate.codes(list(source))
+        chunks = (([product] * len(amounts), amounts) for product, amounts in source.items())
+    else:
+        source = iter(source)
+        first = next(source, None)
+        if first is None:
+            return aggregate
+        source = itertools.chain((first,), source)
+        columnar = not isinstance(first[0], str) and np.ndim(first[0]) > 0
+        chunks = source if columnar else record_chunks(source, chunk_rows)
+    for products, amounts in chunks:
+        aggregate.update(products, amounts)
+    return aggregate
+
+
 def calculate_sales_data(data):
-    totals = {}
-    for label in data:
-        total = 0
-        for sale in sales_data[label]:
-            total += sale
+    totals = aggregate_sales(data).totals()
+    for label, total in totals.items():
         print('total for ' + label + ' is ' + str(total))
-        totals[label] = total
     return max(totals.values())
 
 
 # 2
 
+# binary operations by name; built once, the functions work on numbers and NumPy arrays alike
+OPERATORS = {
+    'mul': operator.mul,
+    'div': operator.truediv,
+    'add': operator.add,
+    'sub': operator.sub,
+    'pow': operator.pow,
+}
+
+
 def operator_switch(value):
-    if value == 'mul':
-        return lambda x, y: x * y
-    elif value == 'div':
-        return lambda x, y: x / y
-    elif value == 'add':
-        return lambda x, y: x + y
-    elif value == 'sub':
-        return lambda x, y: x - y
-    elif value == 'pow':
-        return lambda x, y: x ** y
+    return OPERATORS.get(value)
 
 def calculate(operator, first, second):
     operation = operator_switch(operator)
@@ -63,21 +183,158 @@ def are_even(first, second):
 
 # 3
 
-def is_prime(n):
-    if n < 2:
-        return False
-    for i in range(2, int(n ** 0.5) + 1):
-        if n % i == 0:
+# trial division by these settles most composites before any Miller-Rabin round
+SMALL_PRIMES = tuple(p for p in range(2, 256) if all(p % q for q in range(2, p)))
+# every n below SMALL_PRIMES_LIMIT with no factor in SMALL_PRIMES is prime
+SMALL_PRIMES_LIMIT = 257 ** 2
+# Miller-Rabin with the first 13 primes as bases is exact for n < 3.3 * 10^24 (covers 2^64);
+# bases 2, 7, 61 are exact below 2^32, where the array version can square without overflow
+DETERMINISTIC_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+DETERMINISTIC_LIMIT = 3317044064679887385961981
+UINT32_BASES = (2, 7, 61)
+# random bases used above DETERMINISTIC_LIMIT; a composite survives each with probability <= 1/4
+PROBABILISTIC_ROUNDS = 40
+
+
+def miller_rabin(n, bases):
+    # n odd and > 2; False means n is certainly composite
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in bases:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
             return False
     return True
 
 
-def primes_in_range(start, end):
-    result = []
-    for num in range(start, end + 1):
-        if is_prime(num):
-            result.append(num)
-    return result
+def is_prime(n, rounds=PROBABILISTIC_ROUNDS):
+    if n < 2:
+        return False
+    for p in SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+    if n < SMALL_PRIMES_LIMIT:
+        return True
+    if n < DETERMINISTIC_LIMIT:
+        return miller_rabin(n, DETERMINISTIC_BASES)
+    return miller_rabin(n, (random.randrange(2, n - 1) for _ in range(rounds)))
+
+
+def miller_rabin_uint32(n, bases):
+    # vectorised Miller-Rabin for an array of odd n < 2^32 (uint64, so products stay below 2^64)
+    one = np.uint64(1)
+    d = n - one
+    s = np.zeros(n.shape, dtype=np.uint64)
+    even = d & one == 0
+    while even.any():
+        d[even] >>= one
+        s[even] += one
+        even = d & one == 0
+    probable = np.ones(n.shape, dtype=bool)
+    for a in bases:
+        base = np.uint64(a) % n
+        x = np.ones(n.shape, dtype=np.uint64)
+        e = d.copy()
+        while e.any():
+            odd = e & one == 1
+            x[odd] = x[odd] * base[odd] % n[odd]
+            base = base * base % n
+            e >>= one
+        passed = (x == one) | (x == n - one)
+        for r in range(1, int(s.max(initial=0))):
+            x = x * x % n
+            passed |= (x == n - one) & (r < s)
+        probable &= passed
+    return probable
+
+
+def are_prime(candidates):
+    # primality of every integer in candidates, as a bool array of the same shape. Small-prime
+    # division and the < 2^32 Miller-Rabin run on whole arrays; larger values go through is_prime
+    values = np.asarray(candidates)
+    if values.dtype.kind not in "iu":
+        return np.array([is_prime(int(v)) for v in values.ravel()], dtype=bool).reshape(values.shape)
+    flat = values.ravel()
+    result = np.zeros(flat.shape, dtype=bool)
+    positive = flat > 1
+    n = np.where(positive, flat, 0).astype(np.uint64)
+    pending = positive.copy()
+    for p in SMALL_PRIMES:
+        divisible = n % np.uint64(p) == 0
+        result[divisible & (n == p)] = True
+        pending &= ~divisible
+    result[pending & (n < SMALL_PRIMES_LIMIT)] = True
+    pending &= n >= SMALL_PRIMES_LIMIT
+
+    small = np.flatnonzero(pending & (n < 1 << 32))
+    if small.size:
+        result[small] = miller_rabin_uint32(n[small], UINT32_BASES)
+    for i in np.flatnonzero(pending & (n >= 1 << 32)):
+        result[i] = is_prime(int(n[i]))
+    return result.reshape(values.shape)
+
+
+# numbers sieved at once; bounds the memory of primes_in_range whatever the window
+SIEVE_SEGMENT = 1 << 20
+
+
+def base_primes(limit):
+    # primes <= limit, plain Sieve of Eratosthenes
+    if limit < 2:
+        return np.empty(0, dtype=np.int64)
+    flags = np.ones(limit + 1, dtype=bool)
+    flags[:2] = False
+    for p in range(2, math.isqrt(limit) + 1):
+        if flags[p]:
+            flags[p * p::p] = False
+    return np.flatnonzero(flags).astype(np.int64)
+
+
+def sieve_segment(bounds):
+    # primes in [lo, hi) given every prime up to sqrt(hi - 1); module level so a process pool can run it
+    lo, hi, primes = bounds
+    flags = np.ones(hi - lo, dtype=bool)
+    for p in primes:
+        p = int(p)
+        if p * p >= hi:
+            break
+        flags[max(p * p, -(-lo // p) * p) - lo::p] = False
+    flags[:max(0, 2 - lo)] = False
+    return np.flatnonzero(flags).astype(np.int64) + lo
+
+
+def prime_segments(start, end, segment_size=SIEVE_SEGMENT, workers=1):
+    # arrays of the primes in [start, end], one per segment, in increasing order
+    start = max(start, 0)
+    if end < start:
+        return
+    primes = base_primes(math.isqrt(end))
+    jobs = ((lo, min(lo + segment_size, end + 1), primes) for lo in range(start, end + 1, segment_size))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(sieve_segment, jobs)
+    else:
+        yield from map(sieve_segment, jobs)
+
+
+def iter_primes(start, end, segment_size=SIEVE_SEGMENT):
+    # lazily yields the primes in [start, end]; only one segment is held in memory
+    for segment in prime_segments(start, end, segment_size):
+        yield from segment.tolist()
+
+
+def primes_in_range(start, end, as_array=False, workers=1, segment_size=SIEVE_SEGMENT):
+    segments = list(prime_segments(start, end, segment_size, workers))
+    result = np.concatenate(segments) if segments else np.empty(0, dtype=np.int64)
+    return result if as_array else result.tolist()
 
 # 4
 
@@ -92,14 +349,138 @@ def primes_in_range(start, end):
 # A: I dont raise any errors, instead I print information about the error to the user and continue the loop so It
 # - will start from the beggining
 
+# expression engine: a formula is parsed once into a tree of closures and evaluated on
+# scalars, whole NumPy arrays or a CSV streamed in chunks
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+    ast.Mod: operator.mod,
+}
+UNARY_OPERATORS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+FUNCTIONS = {
+    'sqrt': np.sqrt,
+    'abs': np.abs,
+    'exp': np.exp,
+    'log': np.log,
+    'sin': np.sin,
+    'cos': np.cos,
+}
+CSV_CHUNK_ROWS = 65536
+
+
+class Expression:
+    def __init__(self, text, variables, evaluate):
+        self.text = text
+        self.variables = variables
+        self.evaluate = evaluate
+
+    def __call__(self, **operands):
+        missing = [name for name in self.variables if name not in operands]
+        if missing:
+            raise ValueError(f"Missing values for {', '.join(missing)} in '{self.text}'")
+        return self.evaluate(operands)
+
+    def __repr__(self):
+        return f"Expression('{self.text}', variables={self.variables})"
+
+
+def compile_node(node, variables):
+    # returns a function of the operand mapping; names met along the way go into variables
+    if isinstance(node, ast.Expression):
+        return compile_node(node.body, variables)
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        op = BINARY_OPERATORS[type(node.op)]
+        left, right = compile_node(node.left, variables), compile_node(node.right, variables)
+        return lambda env: op(left(env), right(env))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        op = UNARY_OPERATORS[type(node.op)]
+        operand = compile_node(node.operand, variables)
+        return lambda env: op(operand(env))
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        value = node.value
+        return lambda env: value
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name not in variables:
+            variables.append(name)
+        return lambda env: env[name]
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS \
+            and len(node.args) == 1 and not node.keywords:
+        func = FUNCTIONS[node.func.id]
+        argument = compile_node(node.args[0], variables)
+        return lambda env: func(argument(env))
+    raise ValueError(f"Unsupported syntax in expression: {ast.dump(node)}")
+
+
+@lru_cache(maxsize=256)
+def compile_expression(text):
+    try:
+        tree = ast.parse(text, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression '{text}': {e.msg}") from None
+    variables = []
+    evaluate = compile_node(tree, variables)
+    return Expression(text, tuple(variables), evaluate)
+
+
+def evaluate_expression(text, **operands):
+    # operands may be numbers or arrays (broadcast together by NumPy)
+    expression = compile_expression(text)
+    return expression(**{name: np.asarray(value, dtype=float) if not np.isscalar(value) else value
+                         for name, value in operands.items()})
+
+
+def evaluate_csv(text, path, chunk_rows=CSV_CHUNK_ROWS):
+    # yields the expression evaluated on successive chunks of the CSV at path, whose header
+    # names the columns; only chunk_rows rows are held in memory at a time
+    expression = compile_expression(text)
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        missing = [name for name in expression.variables if name not in header]
+        if missing:
+            raise ValueError(f"Columns {', '.join(missing)} not found in {path}")
+        columns = [header.index(name) for name in expression.variables]
+        rows = []
+        for row in reader:
+            rows.append([row[i] for i in columns])
+            if len(rows) == chunk_rows:
+                yield evaluate_rows(expression, rows)
+                rows = []
+        if rows:
+            yield evaluate_rows(expression, rows)
+
+
+def evaluate_rows(expression, rows):
+    values = np.array(rows, dtype=float).reshape(len(rows), len(expression.variables))
+    result = expression.evaluate(dict(zip(expression.variables, values.T)))
+    # one value per row, even for formulas that do not depend on the columns
+    return np.broadcast_to(result, (len(rows),)).astype(float)
+
+
 def calculator():
     while True:
-        op = input('Type operation (pow, sqrt, add, mul, div, sub): ')
-        if op not in ['pow', 'sqrt', 'add', 'mul', 'div', 'sub']:
+        op = input('Type operation (pow, sqrt, add, mul, div, sub, expr): ')
+        if op not in ['pow', 'sqrt', 'add', 'mul', 'div', 'sub', 'expr']:
             print('Invalid operation')
             continue
         operation = operator_switch(op)
-        if op == 'sqrt':
+        if op == 'expr':
+            try:
+                expression = compile_expression(input('Type expression (e.g. sqrt(a) * b + 1): '))
+                operands = {name: float(input(f'Type {name}: ')) for name in expression.variables}
+                print(str(expression(**operands)))
+            except (ValueError, ZeroDivisionError, OverflowError) as e:
+                print(e)
+                continue
+        elif op == 'sqrt':
             a = float(input('Type a: '))
             if a < 0:
                 print()
@@ -125,7 +506,13 @@ def main():
     print('are even (5 and 11):')
     are_even(5, 11)
     print('primes in range (from 5 to 234): ' + str(primes_in_range(5, 234)))
+    # small-only, large-only and mixed batches must agree with is_prime element by element
+    for batch in ([2, 3, 4, 5], [2 ** 61 - 1, 2 ** 62 + 1], [97, 65537, 4294967291, 2 ** 61 - 1, 2 ** 32 + 1]):
+        flags = are_prime(np.array(batch, dtype=np.uint64)).tolist()
+        assert flags == [is_prime(n) for n in batch]
+        print('are prime ' + str(batch) + ': ' + str(flags))
     calculator()
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -127,15 +127,49 @@ def task3():
 
 # 4
 
+def fib_pair(n, m=None):
+    # (F(n), F(n + 1)), optionally modulo m, by fast doubling over the bits of n:
+    # F(2k) = F(k) * (2F(k+1) - F(k)),  F(2k+1) = F(k)^2 + F(k+1)^2
+    if n < 0:
+        raise ValueError("n must be non-negative")
+    a, b = 0, 1
+    for bit in bin(n)[2:]:
+        c = a * (2 * b - a)
+        d = a * a + b * b
+        if m is not None:
+            c %= m
+            d %= m
+        if bit == '1':
+            a, b = d, c + d
+        else:
+            a, b = c, d
+        if m is not None:
+            b %= m
+    return a, b
+
+
+def fib(n):
+    return fib_pair(n)[0]
+
+
+def fib_mod(n, m):
+    if m < 1:
+        raise ValueError("modulus must be positive")
+    return fib_pair(n, m)[0] % m
+
+
+def iter_fibonacci(count=None, start=0):
+    # lazily yields count terms from F(start) on (forever if count is None); only two terms are kept
+    a, b = fib_pair(start) if start else (0, 1)
+    produced = 0
+    while count is None or produced < count:
+        yield a
+        a, b = b, a + b
+        produced += 1
+
+
 def fibonacci(n):
-    if n <= 0:
-        return []
-    elif n == 1:
-        return [0]
-    fib_seq = [0, 1]
-    for i in range(2, n):
-        fib_seq.append(fib_seq[i - 1] + fib_seq[i - 2])
-    return fib_seq
+    return list(iter_fibonacci(max(n, 0)))
 
 
 def task4():
@@ -144,8 +178,11 @@ def task4():
     except ValueError:
         print("Invalid input. Please enter an integer.")
         return
-    result = fibonacci(n)
-    print("Fibonacci sequence:", result)
+    # terms are printed as they are generated, in the same list format, without building the list
+    print("Fibonacci sequence: [", end="")
+    for i, term in enumerate(iter_fibonacci(max(n, 0))):
+        print(term if i == 0 else f", {term}", end="")
+    print("]")
 
 
 # 5
@@ -206,4 +243,5 @@ def main():
     task_switch_case(task_name)
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,38 @@
 import matplotlib.pyplot as plt
-
-k = int(input('Input drag (k): '))
-m = int(input('Input mass (m): '))
-steps_count = int(input('Input number of steps for simulation: '))
-t_total = int(input('Input time (s): '))
-vx = int(input('Input horizontal velocity vx (m/s): '))
-vy = int(input('Input vertical velocity vy (m/s): '))
-
-if steps_count < 1 or m < 1 or t_total < 1 or k < 1:
-    print('ERROR: Invalid input!')
-    exit(0)
-
-dt = t_total / steps_count
+import numpy as np
+
+k = 0
+m = 0
+steps_count = 0
+t_total = 0
+vx = 0
+vy = 0
+dt = 0
 x = 0
 y = 0
 g = 9.81
 ax = 0
 ay = 0
 
+METHODS = ("euler", "midpoint", "analytic")
+LAMBERT_W_ITERATIONS = 8
+
+
+def read_parameters():
+    global k, m, steps_count, t_total, vx, vy, dt
+    k = int(input('Input drag (k): '))
+    m = int(input('Input mass (m): '))
+    steps_count = int(input('Input number of steps for simulation: '))
+    t_total = int(input('Input time (s): '))
+    vx = int(input('Input horizontal velocity vx (m/s): '))
+    vy = int(input('Input vertical velocity vy (m/s): '))
+
+    if steps_count < 1 or m < 1 or t_total < 1 or k < 1:
+        print('ERROR: Invalid input!')
+        exit(0)
+
+    dt = t_total / steps_count
+
 
 # shared functions
 
@@ -100,24 +115,67 @@ def calculate_halfstep_positions():
     calculate_halfstep_y()
 
 
+# ground impact
+
+IMPACT_NEWTON_ITERATIONS = 4
+
+
+def impact_fraction(y0, vy0, y1, vy1, h):
+    # fraction s in [0, 1] of a step of length h at which the cubic Hermite interpolant through
+    # (y0, vy0) and (y1, vy1) crosses y=0; Newton iterations start from the linear estimate.
+    # Works elementwise on arrays.
+    s = np.clip(y0 / np.where(y0 != y1, y0 - y1, 1.0), 0.0, 1.0)
+    for _ in range(IMPACT_NEWTON_ITERATIONS):
+        s2, s3 = s * s, s * s * s
+        p = (2 * s3 - 3 * s2 + 1) * y0 + (s3 - 2 * s2 + s) * h * vy0 \
+            + (3 * s2 - 2 * s3) * y1 + (s3 - s2) * h * vy1
+        dp = (6 * s2 - 6 * s) * y0 + (3 * s2 - 4 * s + 1) * h * vy0 \
+            + (6 * s - 6 * s2) * y1 + (3 * s2 - 2 * s) * h * vy1
+        s = np.clip(s - p / np.where(dp != 0, dp, -1.0), 0.0, 1.0)
+    return s
+
+
+def hermite_point(s, p0, v0, p1, v1, h):
+    s2, s3 = s * s, s * s * s
+    return (2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * h * v0 \
+        + (3 * s2 - 2 * s3) * p1 + (s3 - s2) * h * v1
+
+
+def clip_at_ground(xs, ys, ts, previous_velocity):
+    # replaces the first below-ground point of a scalar run with the interpolated impact point
+    s = float(impact_fraction(ys[-2], previous_velocity[1], ys[-1], vy, dt))
+    xs[-1] = float(hermite_point(s, xs[-2], previous_velocity[0], xs[-1], vx, dt))
+    ys[-1] = 0.0
+    ts[-1] = ts[-2] + s * dt
+
+
 # Run Euler
-def run_euler_simulation():
+def run_euler_simulation(stop_at_ground=False):
+    # with stop_at_ground the run ends at the impact, whose interpolated point closes the trajectory
     xs = [x]
     ys = [y]
+    ts = [0.0]
     for i in range(steps_count):
+        previous_velocity = (vx, vy)
         calculate_accelerations()
         calculate_velocities()
         calculate_positions()
         xs.append(x)
         ys.append(y)
-    return xs, ys
+        ts.append((i + 1) * dt)
+        if stop_at_ground and y < 0:
+            clip_at_ground(xs, ys, ts, previous_velocity)
+            break
+    return xs, ys, ts
 
 
 # Run Midpoint
-def run_midpoint_simulation():
+def run_midpoint_simulation(stop_at_ground=False):
     xs = [x]
     ys = [y]
+    ts = [0.0]
     for i in range(steps_count):
+        previous_velocity = (vx, vy)
         calculate_accelerations()
         calculate_halfstep_velocities()
         calculate_halfstep_positions()
@@ -128,22 +186,174 @@ def run_midpoint_simulation():
         calculate_positions()
         xs.append(x)
         ys.append(y)
-    return xs, ys
+        ts.append((i + 1) * dt)
+        if stop_at_ground and y < 0:
+            clip_at_ground(xs, ys, ts, previous_velocity)
+            break
+    return xs, ys, ts
+
+
+# analytic (exact solution of the linear-drag equations in calculate_ax / calculate_ay)
+
+def lambert_w0(z):
+    # principal branch of the Lambert W function for z >= -1/e, by Halley iteration
+    z = np.asarray(z, dtype=float)
+    # series around the branch point, log1p near zero, asymptotic expansion for large z
+    # (each guess is only evaluated on its own range of z)
+    p = np.sqrt(np.maximum(2 * (np.e * np.minimum(z, -0.25) + 1), 0.0))
+    large = np.maximum(z, 3.0)
+    w = np.where(z < -0.25, -1 + p - p * p / 3 + 11 / 72 * p ** 3,
+                 np.where(z < 3, np.log1p(np.clip(z, -0.25, 3.0)), np.log(large) - np.log(np.log(large))))
+    for _ in range(LAMBERT_W_ITERATIONS):
+        ew = np.exp(w)
+        f = w * ew - z
+        w1 = w + 1
+        safe = np.abs(w1) > 1e-12
+        denominator = ew * w1 - (w + 2) * f / np.where(safe, 2 * w1, 1.0)
+        w = np.where(safe & (denominator != 0), w - f / np.where(denominator != 0, denominator, 1.0), w)
+    return w
+
+
+def analytic_state(k, m, vx, vy, t):
+    # positions and velocities at times t of projectiles launched from the origin; the launch
+    # parameters broadcast together to shape S and the result has shape t.shape + S
+    k, m, vx, vy = np.broadcast_arrays(*(np.asarray(p, dtype=float) for p in (k, m, vx, vy)))
+    t = np.asarray(t, dtype=float)
+    t = t.reshape(t.shape + (1,) * k.ndim)
+    c = k / m
+    drag = c > 0
+    safe_c = np.where(drag, c, 1.0)
+    decay = np.exp(-c * t)
+    # (1 - e^{-ct}) / c, which tends to t without drag
+    spread = np.where(drag, -np.expm1(-c * t) / safe_c, t)
+    terminal = g / safe_c
+    ux = vx * decay
+    uy = np.where(drag, (vy + terminal) * decay - terminal, vy - g * t)
+    x = vx * spread
+    y = np.where(drag, (vy + terminal) * spread - terminal * t, vy * t - g * t * t / 2)
+    return x, y, ux, uy
+
+
+def analytic_impact(k, m, vx, vy):
+    # closed-form time and x at which each projectile returns to y=0:
+    # T = (1 + c vy / g) / c + W0(-a e^{-a}) / c with a = 1 + c vy / g; 2 vy / g without drag
+    k, m, vx, vy = np.broadcast_arrays(*(np.asarray(p, dtype=float) for p in (k, m, vx, vy)))
+    c = k / m
+    drag = c > 0
+    safe_c = np.where(drag, c, 1.0)
+    a = 1 + safe_c * vy / g
+    impact_time = np.where(drag, (a + lambert_w0(-a * np.exp(-a))) / safe_c, 2 * vy / g)
+    impact_time = np.maximum(impact_time, 0.0)
+    impact_x = np.where(drag, vx * -np.expm1(-c * impact_time) / safe_c, vx * impact_time)
+    return impact_time, impact_x
+
+
+def run_analytic_simulation(stop_at_ground=False):
+    # the exact trajectory sampled on the same time grid as the numerical runs
+    ts = np.arange(steps_count + 1) * dt
+    impact_time, _ = analytic_impact(k, m, vx, vy)
+    # like the numerical runs, the trajectory only ends at the impact if it lands by t_total
+    landed = stop_at_ground and impact_time <= ts[-1]
+    if landed:
+        ts = np.append(ts[ts < impact_time], impact_time)
+    xs, ys, _, _ = analytic_state(k, m, vx, vy, ts)
+    if landed:
+        ys[-1] = 0.0
+    return list(xs), list(ys), list(ts)
+
+
+# batch (vectorized)
+
+def analytic_batch(k, m, vx, vy, t_total, times, stop_at_ground):
+    # the analytic counterpart of simulate_batch, sampled at the recorded times
+    impact_time, impact_x = analytic_impact(k, m, vx, vy)
+    xs, ys, _, _ = analytic_state(k, m, vx, vy, times)
+    if stop_at_ground:
+        down = times.reshape(times.shape + (1,) * k.ndim) >= impact_time
+        xs = np.where(down, impact_x, xs)
+        ys = np.where(down, 0.0, ys)
+    missed = impact_time > t_total
+    return xs, ys, np.where(missed, np.nan, impact_time), np.where(missed, np.nan, impact_x)
+
+
+def simulate_batch(k, m, vx, vy, t_total, steps_count, method="euler", record_every=1, stop_at_ground=True):
+    # integrates every (k, m, vx, vy) combination (broadcast together) at once. The first step that
+    # takes a projectile below y=0 is resolved to the interpolated impact time and x; with
+    # stop_at_ground the projectile is frozen at that point and no longer integrated, and the run
+    # ends as soon as all of them are down. Returns xs, ys of shape (n_records, *shape) and the
+    # impact time and x of each projectile (NaN if still flying at t_total)
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}', expected one of {METHODS}")
+    k, m, vx, vy = np.broadcast_arrays(*(np.asarray(p, dtype=float) for p in (k, m, vx, vy)))
+    shape = k.shape
+    dt = t_total / steps_count
+    if method == "analytic":
+        return analytic_batch(k, m, vx, vy, t_total, np.arange(0, steps_count + 1, record_every) * dt, stop_at_ground)
+    drag = (k / m).ravel()
+    pos_x, pos_y = np.zeros((2, drag.size))
+    vel_x, vel_y = vx.ravel().copy(), vy.ravel().copy()
+    impact_time, impact_x = np.full((2, drag.size), np.nan)
+    xs, ys = np.empty((2, steps_count // record_every + 1, drag.size))
+    xs[0], ys[0] = pos_x, pos_y
+
+    active = np.arange(drag.size)
+    flying = np.ones(drag.size, dtype=bool)
+    d, px, py, ux, uy = drag, pos_x, pos_y, vel_x, vel_y
+    for i in range(1, steps_count + 1):
+        if not active.size:
+            # everything is down: the remaining records all hold the impact points
+            first = -(-i // record_every)
+            xs[first:], ys[first:] = pos_x, pos_y
+            break
+        x0, y0, ux0, uy0 = px, py, ux, uy
+        if method == "euler":
+            # velocities first, then positions with the new velocities (as run_euler_simulation)
+            ux = ux + (-d * ux) * dt
+            uy = uy + (-g - d * uy) * dt
+            px = px + ux * dt
+            py = py + uy * dt
+        else:
+            mid_x = ux + (-d * ux) * (dt / 2)
+            mid_y = uy + (-g - d * uy) * (dt / 2)
+            px = px + mid_x * dt
+            py = py + mid_y * dt
+            ux = ux + (-d * mid_x) * dt
+            uy = uy + (-g - d * mid_y) * dt
+        landed = (py < 0) & flying[active]
+        if landed.any():
+            s = impact_fraction(y0[landed], uy0[landed], py[landed], uy[landed], dt)
+            hit = active[landed]
+            flying[hit] = False
+            impact_time[hit] = (i - 1 + s) * dt
+            impact_x[hit] = hermite_point(s, x0[landed], ux0[landed], px[landed], ux[landed], dt)
+            if stop_at_ground:
+                px[landed], py[landed] = impact_x[hit], 0.0
+        pos_x[active], pos_y[active] = px, py
+        vel_x[active], vel_y[active] = ux, uy
+        if stop_at_ground and landed.any():
+            keep = ~landed
+            active, d, px, py, ux, uy = active[keep], d[keep], px[keep], py[keep], ux[keep], uy[keep]
+        if i % record_every == 0:
+            xs[i // record_every], ys[i // record_every] = pos_x, pos_y
+
+    return (xs.reshape(xs.shape[:1] + shape), ys.reshape(ys.shape[:1] + shape),
+            impact_time.reshape(shape), impact_x.reshape(shape))
 
 
 def draw_and_run(choice):
     if choice == 1:
         method_name = "Euler"
-        xs, ys = run_euler_simulation()
+        xs, ys, ts = run_euler_simulation(stop_at_ground=True)
     elif choice == 2:
         method_name = "Midpoint"
-        xs, ys = run_midpoint_simulation()
+        xs, ys, ts = run_midpoint_simulation(stop_at_ground=True)
+    elif choice == 3:
+        method_name = "Analytic"
+        xs, ys, ts = run_analytic_simulation(stop_at_ground=True)
     else:
         print('ERROR: Invalid choice!')
         exit(0)
 
-    ts = [i * dt for i in range(len(xs))]
-
     plt.figure(figsize=(10, 6))
 
     plt.plot(xs, ys, marker='o', markersize=4, label=f'{method_name} Trajectory', linewidth=1)
@@ -163,8 +373,10 @@ def draw_and_run(choice):
 
 
 def main():
-    choice = int(input('Input 1 for euler simulation or 2 for midpoint simulation: '))
+    read_parameters()
+    choice = int(input('Input 1 for euler simulation, 2 for midpoint simulation or 3 for the exact solution: '))
     draw_and_run(choice)
 
 
-main()
+if __name__ == "__main__":
+    main()
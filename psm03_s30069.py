@@ -2,6 +2,9 @@ import math
 import matplotlib.pyplot as plt
 import numpy as np
 
+from adaptive_rk import dormand_prince
+from shared_results import SharedAllocator
+
 g_const = 9.81
 t_final = 10
 dt = 0.01
@@ -42,30 +45,125 @@ def rk4_integration(a, v):
             v + (dt / 6) * (e1 + 2 * e2 + 2 * e3 + e4))
 
 
-def run_simulation(func, a, v):
-    t = 0.0
-    t_vals = [t]
-    a_vals = [a]
-    v_vals = [v]
-    for _ in range(num_steps):
+def acceleration(a):
+    return -(g_const / L) * np.sin(a)
+
+
+def verlet_step(a, v, h, e1):
+    # kick-drift-kick substep from the acceleration e1 at a; also returns the closing acceleration,
+    # which is the opening one of a following substep
+    v_half = v + 0.5 * h * e1
+    a_new = a + h * v_half
+    e2 = acceleration(a_new)
+    return a_new, v_half + 0.5 * h * e2, e2
+
+
+def leapfrog_integration(a, v):
+    a, v, _ = verlet_step(a, v, dt, acceleration(a))
+    return a, v
+
+
+# Yoshida's 4th order composition of three velocity Verlet substeps
+YOSHIDA_W1 = 1 / (2 - 2 ** (1 / 3))
+YOSHIDA_W0 = -2 ** (1 / 3) / (2 - 2 ** (1 / 3))
+
+
+def yoshida4_integration(a, v):
+    e = acceleration(a)
+    for w in (YOSHIDA_W1, YOSHIDA_W0, YOSHIDA_W1):
+        a, v, e = verlet_step(a, v, w * dt, e)
+    return a, v
+
+
+class SymplecticStepper:
+    # one run's leapfrog / Yoshida4 stepping: the acceleration closing a step opens the next one
+    # (first-same-as-last), so each substep costs one evaluation. It must be fed back the state it
+    # returned, which is why run_simulation / run_ensemble create a fresh one for every run
+    def __init__(self, weights):
+        self.weights = weights
+        self.acc = None
+
+    def __call__(self, a, v):
+        e = acceleration(a) if self.acc is None else self.acc
+        for w in self.weights:
+            a, v, e = verlet_step(a, v, w * dt, e)
+        self.acc = e
+        return a, v
+
+
+SYMPLECTIC_WEIGHTS = {
+    leapfrog_integration: (1.0,),
+    yoshida4_integration: (YOSHIDA_W1, YOSHIDA_W0, YOSHIDA_W1),
+}
+
+
+def stepper_for(func):
+    # symplectic methods get a per-run stepper that carries the acceleration between steps
+    weights = SYMPLECTIC_WEIGHTS.get(func)
+    return func if weights is None else SymplecticStepper(weights)
+
+
+def run_simulation(func, a, v, record_every=1, alloc=np.empty):
+    n_records = num_steps // record_every + 1
+    t_vals, a_vals, v_vals = alloc((3, n_records))
+    t_vals[0], a_vals[0], v_vals[0] = 0.0, a, v
+    func = stepper_for(func)
+    for i in range(1, num_steps + 1):
+        a, v = func(a, v)
+        if i % record_every == 0:
+            j = i // record_every
+            t_vals[j], a_vals[j], v_vals[j] = i * dt, a, v
+    return t_vals, a_vals, v_vals
+
+
+def run_ensemble(func, angles, velocities, record_every=1, alloc=np.empty):
+    # the integrators are elementwise, so whole arrays of initial conditions advance together;
+    # a_vals/v_vals are (n_records, *angles.shape)
+    a, v = np.broadcast_arrays(np.asarray(angles, dtype=float), np.asarray(velocities, dtype=float))
+    n_records = num_steps // record_every + 1
+    t_vals = np.arange(n_records) * (record_every * dt)
+    a_vals, v_vals = alloc((2, n_records) + a.shape)
+    a_vals[0], v_vals[0] = a, v
+    func = stepper_for(func)
+    for i in range(1, num_steps + 1):
         a, v = func(a, v)
-        t += dt
-        t_vals.append(t)
-        a_vals.append(a)
-        v_vals.append(v)
+        if i % record_every == 0:
+            a_vals[i // record_every], v_vals[i // record_every] = a, v
     return t_vals, a_vals, v_vals
 
 
-def plot_outcome(ts, as_, vs):
-    arr_a = np.array(as_)
-    arr_v = np.array(vs)
-    ke = 0.5 * m * (L * arr_v) ** 2
-    pe = m * g_const * L * (1 - np.cos(arr_a))
-    te = ke + pe
+def run_simulation_shared(func, a, v, record_every=1, directory=None):
+    # worker entry point: the (3, n) time/angle/velocity block is written straight into shared
+    # memory (or a memory-mapped file) and only its handle goes back to the parent
+    alloc = SharedAllocator(directory)
+    run_simulation(func, a, v, record_every, alloc)
+    alloc.close()
+    return alloc.handles[0]
+
+
+def run_adaptive_simulation(a, v, rtol=1e-8, atol=1e-10):
+    sol = dormand_prince(lambda t, y: np.array(dynamics(y[0], y[1])),
+                         (0.0, t_final), [a, v], rtol=rtol, atol=atol)
+    print(f"RK45: {sol.n_accepted} steps, {sol.n_rejected} rejected, {sol.n_evals} evaluations")
+    return sol.t, sol.y[:, 0], sol.y[:, 1]
+
+
+def pendulum_energies(angles, velocities):
+    ke = 0.5 * m * (L * velocities) ** 2
+    pe = m * g_const * L * (1 - np.cos(angles))
+    return ke, pe, ke + pe
+
+
+def plot_outcome(ts, as_, vs, energy_every=1):
+    # energies are only evaluated on every energy_every-th recorded sample
+    arr_a = np.asarray(as_)
+    arr_v = np.asarray(vs)
+    ke, pe, te = pendulum_energies(arr_a[::energy_every], arr_v[::energy_every])
+    ts_e = np.asarray(ts)[::energy_every]
     fig, axx = plt.subplots(1, 2, figsize=(12, 5))
-    axx[0].plot(ts, ke, label='Kinetic')
-    axx[0].plot(ts, pe, label='Potential')
-    axx[0].plot(ts, te, label='Total')
+    axx[0].plot(ts_e, ke, label='Kinetic')
+    axx[0].plot(ts_e, pe, label='Potential')
+    axx[0].plot(ts_e, te, label='Total')
     axx[0].set_title(f'Energy - {method_name}')
     axx[0].set_xlabel('Time (s)')
     axx[0].set_ylabel('Energy (J)')
@@ -92,6 +190,16 @@ def select_method(num):
     elif num == 3:
         method_name = 'RK4'
         f = rk4_integration
+    elif num == 4:
+        method_name = 'RK45 (adaptive)'
+        plot_outcome(*run_adaptive_simulation(start_angle, start_velocity))
+        return
+    elif num == 5:
+        method_name = 'Leapfrog'
+        f = leapfrog_integration
+    elif num == 6:
+        method_name = 'Yoshida4'
+        f = yoshida4_integration
     else:
         print("Invalid choice.")
         return
@@ -118,9 +226,10 @@ def main():
     deg_a = ask_for_value("Angle (deg): ", float)
     start_angle = math.radians(deg_a)
     start_velocity = ask_for_value("Velocity: ", float)
-    choice = ask_for_value("Method (1=Euler,2=Midpoint,3=RK4): ", int,
-                           lambda x: x in [1, 2, 3], "Enter 1,2,or 3")
+    choice = ask_for_value("Method (1=Euler,2=Midpoint,3=RK4,4=RK45,5=Leapfrog,6=Yoshida4): ", int,
+                           lambda x: x in [1, 2, 3, 4, 5, 6], "Enter a number from 1 to 6")
     select_method(choice)
 
 
-main()
+if __name__ == "__main__":
+    main()
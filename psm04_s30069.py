@@ -1,53 +1,153 @@
 import math
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import matplotlib.pyplot as plt
+import numpy as np
 
-# list of values:
 # constants
 g = 9.81
 
-# provided
-mass = 0
-height = 0
-radius = 0
-alpha = 0
-time = 0
-steps = 0
-
-# calculated
-inertia = 0
-acceleration = 0
-epsilon = 0
-dt = 0
-sx = 0
-sy = 0
-vx = 0
-dsx = 0
-dvx = 0
-xc = 0
-yc = 0
-beta = 0
-omega = 0
-db = 0
-dw = 0
-x = 0
-y = 0
-
-# energies
-ep = 0
-ek = 0
-et = 0
-
-# for plotting
-t_data = []
-x_data = []
-y_data = []
-ep_data = []
-ek_data = []
-et_data = []
-
-# user choices
-object_choice = 0
-method_choice = 0
+# moment of inertia as a fraction of m * r^2
+INERTIA_FACTORS = {
+    "sphere": 2.0 / 5.0,
+    "cylinder": 0.5,
+    "hollow_sphere": 2.0 / 3.0,
+    "hoop": 1.0,
+}
+METHODS = ("euler", "midpoint", "analytic")
+
+
+class RollingSimulation:
+    __slots__ = (
+        # provided
+        "mass", "height", "radius", "alpha", "time", "steps", "shape", "method", "record_every",
+        # calculated
+        "inertia", "acceleration", "epsilon", "dt",
+        "sx", "sy", "vx", "xc", "yc", "beta", "omega", "x", "y",
+        # energies
+        "ep", "ek", "et",
+    )
+
+    def __init__(self, mass, height, radius, alpha, time, steps, shape="sphere", method="euler",
+                 record_every=1):
+        if shape not in INERTIA_FACTORS:
+            raise ValueError(f"Unknown shape '{shape}', expected one of {tuple(INERTIA_FACTORS)}")
+        if method not in METHODS:
+            raise ValueError(f"Unknown method '{method}', expected one of {METHODS}")
+        self.mass = mass
+        self.height = height
+        self.radius = radius
+        self.alpha = alpha
+        self.time = time
+        self.steps = steps
+        self.shape = shape
+        self.method = method
+        self.record_every = record_every
+
+        self.inertia = INERTIA_FACTORS[shape] * mass * (radius ** 2)
+        self.acceleration = g * math.sin(alpha) / (1 + self.inertia / (mass * (radius ** 2)))
+        self.epsilon = self.acceleration / radius
+        self.dt = time / steps
+        self.reset()
+
+    def reset(self):
+        self.sx = self.sy = self.vx = 0.0
+        self.beta = self.omega = 0.0
+        self.xc = self.yc = self.x = self.y = 0.0
+        self.ep = self.ek = self.et = 0.0
+
+    # EULER METHOD UPDATES
+    def update_euler(self):
+        dt = self.dt
+        # Linear
+        self.sx += dt * self.vx
+        self.vx += self.acceleration * dt
+        # Rotation
+        self.beta += self.omega * dt
+        self.omega += self.epsilon * dt
+
+    # MIDPOINT METHOD UPDATES
+    def update_midpoint(self):
+        # s_mid and beta_mid are not needed because alpha is constant so acceleration is also
+        dt = self.dt
+        v_mid = self.vx + 0.5 * self.acceleration * dt
+        omega_mid = self.omega + 0.5 * self.epsilon * dt
+        # linear
+        self.sx += v_mid * dt
+        self.vx += self.acceleration * dt
+        # rotation
+        self.beta += omega_mid * dt
+        self.omega += self.epsilon * dt
+
+    def update_center_coords(self):
+        self.xc = self.sx * math.cos(-self.alpha) - self.sy * math.sin(-self.alpha)
+        self.yc = self.sx * math.sin(-self.alpha) + self.sy * math.cos(-self.alpha) + self.height
+
+    def update_xy(self):
+        angle = self.alpha + math.pi / 2 - self.beta
+        self.x = self.xc + self.radius * math.cos(angle)
+        self.y = self.yc + self.radius * math.sin(angle)
+
+    def update_energies(self):
+        self.ep = self.mass * g * self.yc
+        self.ek = 0.5 * self.mass * (self.vx ** 2) + 0.5 * self.inertia * (self.omega ** 2)
+        self.et = self.ep + self.ek
+
+    # EXACT SOLUTION
+    def evaluate_analytic(self, t):
+        # acceleration and epsilon are constant, so the motion from rest has a closed form;
+        # sy stays 0, which reduces update_center_coords to the expressions below
+        t = np.asarray(t, dtype=float)
+        s_t = 0.5 * self.acceleration * t ** 2
+        v_t = self.acceleration * t
+        beta_t = 0.5 * self.epsilon * t ** 2
+        omega_t = self.epsilon * t
+        xc_t = s_t * math.cos(self.alpha)
+        yc_t = self.height - s_t * math.sin(self.alpha)
+        x_t = xc_t + self.radius * np.cos(self.alpha + math.pi / 2 - beta_t)
+        y_t = yc_t + self.radius * np.sin(self.alpha + math.pi / 2 - beta_t)
+        ep_t = self.mass * g * yc_t
+        ek_t = 0.5 * self.mass * v_t ** 2 + 0.5 * self.inertia * omega_t ** 2
+        return s_t, v_t, beta_t, omega_t, x_t, y_t, ep_t, ek_t, ep_t + ek_t
+
+    def run(self):
+        # returns t, x, y, ep, ek, et arrays, one entry every record_every steps
+        record_every = self.record_every
+        if self.method == "analytic":
+            t_data = np.arange(0, self.steps + 1, record_every) * self.dt
+            _, _, _, _, x_data, y_data, ep_data, ek_data, et_data = self.evaluate_analytic(t_data)
+            return t_data, x_data, y_data, ep_data, ek_data, et_data
+
+        self.reset()
+        data = np.empty((6, self.steps // record_every + 1))
+        t_data, x_data, y_data, ep_data, ek_data, et_data = data
+        update = self.update_euler if self.method == "euler" else self.update_midpoint
+        update_center_coords, update_xy, update_energies = \
+            self.update_center_coords, self.update_xy, self.update_energies
+        for i in range(self.steps + 1):
+            # entry i is the state after i steps, starting from the initial state
+            if i:
+                update()
+            update_center_coords()
+            update_xy()
+            update_energies()
+            if i % record_every == 0:
+                j = i // record_every
+                t_data[j] = i * self.dt
+                x_data[j], y_data[j] = self.x, self.y
+                ep_data[j], ek_data[j], et_data[j] = self.ep, self.ek, self.et
+        return tuple(data)
+
+
+def run_configuration(config):
+    return RollingSimulation(**config).run()
+
+
+def run_batch(configs, workers=None, use_processes=True):
+    # each configuration is a dict of RollingSimulation arguments; results keep the input order
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        return list(executor.map(run_configuration, configs))
 
 
 def prompt_value(txt, cond=lambda x: True, err="Invalid input"):
@@ -65,18 +165,19 @@ def prompt_value(txt, cond=lambda x: True, err="Invalid input"):
 
 
 def choose_object():
+    shapes = list(INERTIA_FACTORS)
     while True:
         print("Choose object to simulate:")
-        print("1 - Sphere")
-        print("2 - Cylinder")
+        for i, name in enumerate(shapes, start=1):
+            print(f"{i} - {name.replace('_', ' ').capitalize()}")
         val_str = input("Enter choice: ")
         try:
             choice = int(val_str)
-            if choice in [1, 2]:
-                return choice
+            if 1 <= choice <= len(shapes):
+                return shapes[choice - 1]
         except ValueError:
             pass
-        print("Invalid choice. Please enter 1 or 2.")
+        print(f"Invalid choice. Please enter a number from 1 to {len(shapes)}.")
 
 
 def choose_method():
@@ -84,130 +185,18 @@ def choose_method():
         print("Choose integration method:")
         print("1 - Euler Method")
         print("2 - Midpoint Method")
+        print("3 - Exact (analytic) solution")
         val_str = input("Enter choice: ")
         try:
             choice = int(val_str)
-            if choice in [1, 2]:
-                return choice
+            if choice in [1, 2, 3]:
+                return METHODS[choice - 1]
         except ValueError:
             pass
-        print("Invalid choice. Please enter 1 or 2.")
-
-
-def set_inertia_for_object():
-    global inertia
-    if object_choice == 1:
-        # Sphere
-        inertia = (2.0 / 5.0) * mass * (radius ** 2)
-    elif object_choice == 2:
-        # Solid Cylinder
-        inertia = 0.5 * mass * (radius ** 2)
-
-
-def calculate_acceleration():
-    global acceleration
-    numerator = g * math.sin(alpha)
-    denominator = 1 + (inertia / (mass * (radius ** 2)))
-    acceleration = numerator / denominator
-
-
-def calculate_epsilon():
-    global epsilon
-    epsilon = acceleration / radius
-
-
-def calculate_dt():
-    global dt
-    dt = time / steps
-
-
-# EULER METHOD UPDATES
-def update_euler():
-    global sx, vx, dsx, dvx
-    global beta, omega, db, dw
-
-    # Linear
-    dsx = dt * vx
-    sx += dsx
-    dvx = acceleration * dt
-    vx += dvx
-
-    # Rotation
-    db = omega * dt
-    beta += db
-    dw = epsilon * dt
-    omega += dw
-
-
-# MIDPOINT METHOD UPDATES
-def update_midpoint():
-    # s_mid and beta_mid are not used because alpha is constant so acceleration is also
-    global sx, vx, dsx, dvx
-    global beta, omega, db, dw
-
-    k1_s = vx
-    k1_v = acceleration
-
-    s_mid = sx + 0.5 * k1_s * dt
-    v_mid = vx + 0.5 * k1_v * dt
-
-    k1_beta = omega
-    k1_omega = epsilon
-
-    beta_mid = beta + 0.5 * k1_beta * dt
-    omega_mid = omega + 0.5 * k1_omega * dt
-
-    # k2 for linear
-    k2_s = v_mid
-    k2_v = acceleration
-
-    # k2 for rotation
-    k2_beta = omega_mid
-    k2_omega = epsilon
-
-    # linear
-    sx += k2_s * dt
-    vx += k2_v * dt
+        print("Invalid choice. Please enter 1, 2 or 3.")
 
-    # rotation
-    beta += k2_beta * dt
-    omega += k2_omega * dt
 
-
-def update_center_coords():
-    global xc, yc
-    first_term = sx * math.cos(-alpha)
-    second_term = sy * math.sin(-alpha)
-    xc = first_term - second_term
-
-    first_term = sx * math.sin(-alpha)
-    second_term = sy * math.cos(-alpha)
-    yc = first_term + second_term + height
-
-
-def calculate_x():
-    global x
-    x = xc + radius * math.cos(alpha + math.pi / 2 - beta)
-
-
-def calculate_y():
-    global y
-    y = yc + radius * math.sin(alpha + math.pi / 2 - beta)
-
-
-def update_xy():
-    calculate_x()
-    calculate_y()
-
-
-def update_energies():
-    global ep, ek, et
-    ep = mass * g * yc
-    ek = 0.5 * mass * (vx ** 2) + 0.5 * inertia * (omega ** 2)
-    et = ep + ek
-
-
-def plot_results():
+def plot_results(t_data, x_data, y_data, ep_data, ek_data, et_data):
     plt.figure(figsize=(7, 5))
     plt.plot(x_data, y_data, 'o-', label='Path')
     plt.title("Path (X vs. Y)")
@@ -230,11 +219,8 @@ def plot_results():
 
 
 def main():
-    global mass, height, radius, alpha, time, steps
-    global object_choice, method_choice
-    object_choice = choose_object()
-
-    method_choice = choose_method()
+    shape = choose_object()
+    method = choose_method()
 
     mass = prompt_value('Enter mass: ', lambda v: v > 0, "Must be > 0")
     height = prompt_value('Enter height: ', lambda v: v >= 0, "Must be >= 0")
@@ -243,42 +229,9 @@ def main():
     time = prompt_value('Enter time (s): ', lambda v: v > 0, "Must be > 0")
     steps = int(prompt_value('Enter steps: ', lambda v: v > 0, "Must be > 0"))
 
-    alpha = math.radians(alpha_deg)
-
-    set_inertia_for_object()
-    calculate_acceleration()
-    calculate_epsilon()
-    calculate_dt()
-
-    t_data.clear()
-    x_data.clear()
-    y_data.clear()
-    ep_data.clear()
-    ek_data.clear()
-    et_data.clear()
-
-    for i in range(steps + 1):
-        t_current = i * dt
-        t_data.append(t_current)
-
-        if method_choice == 1:
-            update_euler()
-        else:
-            update_midpoint()
-
-        update_center_coords()
-
-        update_xy()
-
-        update_energies()
-
-        x_data.append(x)
-        y_data.append(y)
-        ep_data.append(ep)
-        ek_data.append(ek)
-        et_data.append(et)
-
-    plot_results()
+    sim = RollingSimulation(mass, height, radius, math.radians(alpha_deg), time, steps, shape, method)
+    plot_results(*sim.run())
 
 
-main()
+if __name__ == "__main__":
+    main()
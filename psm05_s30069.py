@@ -1,6 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
+from adaptive_rk import dormand_prince
+from nbody import calculate_nbody_accelerations, calculate_nbody_derivatives, pack_state
+
 KM_TO_M = 1000.0
 HOUR_TO_S = 3600.0
 DAY_TO_S = 24 * HOUR_TO_S
@@ -17,6 +20,17 @@ DEFAULT_VALUES = {
     "T_days": 365.25,
 }
 
+INTEGRATION_METHODS = ("improved_euler", "rk45", "leapfrog", "yoshida4")
+SYMPLECTIC_WEIGHTS = {
+    "leapfrog": (1.0,),
+    "yoshida4": (1 / (2 - 2 ** (1 / 3)), -2 ** (1 / 3) / (2 - 2 ** (1 / 3)), 1 / (2 - 2 ** (1 / 3))),
+}
+# earth_moon: Sun fixed at the origin, Earth and Moon only; nbody: Earth, Moon and Sun all attract each other
+MODELS = ("earth_moon", "nbody")
+# streamed trajectories: records are flushed to disk every FLUSH_EVERY rows
+FLUSH_EVERY = 100_000
+MAX_PLOT_POINTS = 200_000
+
 
 def input_parameter(prompt, default, factor=1.0):
     try:
@@ -26,6 +40,11 @@ def input_parameter(prompt, default, factor=1.0):
         return default * factor
 
 
+def input_choice(prompt, choices, default):
+    value_str = input(f"{prompt} {'/'.join(choices)} [{default}]: ").strip()
+    return value_str if value_str in choices else default
+
+
 def get_simulation_parameters(defaults):
     params = {}
     print("Enter simulation parameters (leave blank to use defaults):")
@@ -74,6 +93,15 @@ def calculate_initial_positions_velocities(params):
     return np.concatenate((earth_pos, earth_vel, moon_pos, moon_vel))
 
 
+def add_sun_to_state(params, state):
+    # Earth and Moon stay first so the state columns match the earth_moon model; the Sun
+    # starts at the origin with the velocity that keeps the total momentum zero
+    masses = np.array([params['Mz'], params['Mk'], params['Ms']])
+    bodies = state.reshape(2, 4)
+    sun_velocity = -(masses[:2] @ bodies[:, 2:]) / masses[2]
+    return masses, np.concatenate((state, [0.0, 0.0], sun_velocity))
+
+
 def compute_earth_acceleration(earth_position, G, Ms):
     r = np.linalg.norm(earth_position)
     return -G * Ms * earth_position / (r ** 3) if r != 0 else np.zeros(2)
@@ -98,32 +126,153 @@ def calculate_gravitational_derivatives(state, t, G, Ms, Mz, Mk):
     return np.concatenate((earth_vel, earth_acc, moon_vel, moon_acc))
 
 
-def perform_improved_euler_step(state, t, dt, deriv_func, G, Ms, Mz, Mk):
-    k1 = dt * deriv_func(state, t, G, Ms, Mz, Mk)
+def calculate_gravitational_accelerations(positions, t, G, Ms, Mz, Mk):
+    # positions is (2, 2): Earth then Moon
+    acc = np.empty((2, 2))
+    acc[0] = compute_earth_acceleration(positions[0], G, Ms)
+    acc[1] = compute_moon_acceleration(positions[1], positions[0], G, Ms, Mz)
+    return acc
+
+
+def perform_improved_euler_step(state, t, dt, deriv_func, *deriv_args):
+    k1 = dt * deriv_func(state, t, *deriv_args)
     midpoint_state = state + k1 / 2.0
-    k2 = dt * deriv_func(midpoint_state, t + dt / 2.0, G, Ms, Mz, Mk)
+    k2 = dt * deriv_func(midpoint_state, t + dt / 2.0, *deriv_args)
     return state + k2
 
 
-def simulation_loop(state, t, dt, T, deriv_func, G, Ms, Mz, Mk):
-    times = [t]
-    history = [state]
+class SymplecticStepper:
+    # kick-drift-kick velocity Verlet substeps of length w * dt, usable as a simulation_loop step_func.
+    # accel_func(positions, t, *deriv_args) gives the (n_bodies, dim) accelerations. The
+    # acceleration closing one substep is the one the next substep opens with (first-same-as-last),
+    # so it is kept across substeps and steps: one evaluation per substep
+    def __init__(self, accel_func, dim=2, weights=(1.0,)):
+        self.accel_func = accel_func
+        self.dim = dim
+        self.weights = weights
+        self.last_state = None
+        self.acc = None
+
+    def __call__(self, state, t, dt, deriv_func, *deriv_args):
+        dim = self.dim
+        acc = self.acc if state is self.last_state else None
+        state = state.copy()
+        bodies = state.reshape(-1, 2 * dim)
+        positions, velocities = bodies[:, :dim], bodies[:, dim:]
+        if acc is None:
+            acc = self.accel_func(positions, t, *deriv_args)
+        for w in self.weights:
+            h = w * dt
+            velocities += 0.5 * h * acc
+            positions += h * velocities
+            t += h
+            acc = self.accel_func(positions, t, *deriv_args)
+            velocities += 0.5 * h * acc
+        self.last_state, self.acc = state, acc
+        return state
+
+
+def open_trajectory_file(path, n_records, width):
+    # one .npy of shape (n_records, 1 + width): column 0 is time, the rest is the state
+    records = np.lib.format.open_memmap(path, mode='w+', dtype=float, shape=(n_records, 1 + width))
+    return records, records[:, 0], records[:, 1:]
+
+
+def save_trajectory(path, times, states):
+    records, file_times, file_states = open_trajectory_file(path, len(times), states.shape[1])
+    file_times[:] = times
+    file_states[:] = states
+    records.flush()
+    return file_times, file_states
+
+
+def load_trajectory(path):
+    records = np.load(path, mmap_mode='r')
+    return records[:, 0], records[:, 1:]
+
+
+def simulation_loop(state, t, dt, T, deriv_func, *deriv_args, record_every=1, output_path=None,
+                    step_func=perform_improved_euler_step):
     n_steps = int(T / dt)
-    for i in range(n_steps):
-        state = perform_improved_euler_step(state, t, dt, deriv_func, G, Ms, Mz, Mk)
+    n_records = n_steps // record_every + 1
+    if output_path is None:
+        records = None
+        times = np.empty(n_records)
+        history = np.empty((n_records, state.size))
+    else:
+        records, times, history = open_trajectory_file(output_path, n_records, state.size)
+    times[0], history[0] = t, state
+    progress_every = max(1, n_steps // 20)
+    for i in range(1, n_steps + 1):
+        state = step_func(state, t, dt, deriv_func, *deriv_args)
         t += dt
-        history.append(state)
-        times.append(t)
-        if (i + 1) % (n_steps // 20) == 0:
-            print(f"  Progress: {100 * (i + 1) / n_steps:.1f}%")
-    return times, np.array(history)
-
-
-def run_simulation(params, initial_state):
+        if i % record_every == 0:
+            times[i // record_every] = t
+            history[i // record_every] = state
+            if records is not None and (i // record_every) % FLUSH_EVERY == 0:
+                records.flush()
+        if i % progress_every == 0:
+            print(f"  Progress: {100 * i / n_steps:.1f}%")
+    if records is not None:
+        records.flush()
+    return times, history
+
+
+def adaptive_simulation_loop(state, t, T, deriv_func, *deriv_args, rtol=1e-10, atol=1e-3, dt=None):
+    sol = dormand_prince(lambda time, y: deriv_func(y, time, *deriv_args),
+                         (t, t + T), state, rtol=rtol, atol=atol, first_step=dt)
+    print(f"  RK45: {sol.n_accepted} steps, {sol.n_rejected} rejected, {sol.n_evals} evaluations")
+    return sol.t, sol.y
+
+
+def integrate_system(state, dt, T, deriv_func, deriv_args, method, output_path=None, record_every=1, dim=2,
+                     accel_func=None):
+    # accel_func (positions, t, *deriv_args) -> accelerations drives the symplectic methods
+    if method == "improved_euler":
+        return simulation_loop(state, 0.0, dt, T, deriv_func, *deriv_args,
+                               record_every=record_every, output_path=output_path)
+    if method in SYMPLECTIC_WEIGHTS:
+        if accel_func is None:
+            raise ValueError(f"Method '{method}' needs an acceleration function")
+        step = SymplecticStepper(accel_func, dim, SYMPLECTIC_WEIGHTS[method])
+        return simulation_loop(state, 0.0, dt, T, deriv_func, *deriv_args,
+                               record_every=record_every, output_path=output_path, step_func=step)
+    if method == "rk45":
+        times, states = adaptive_simulation_loop(state, 0.0, T, deriv_func, *deriv_args, dt=dt)
+        if output_path is not None:
+            times, states = save_trajectory(output_path, times, states)
+        return times, states
+    raise ValueError(f"Unknown integration method '{method}', expected one of {INTEGRATION_METHODS}")
+
+
+def run_nbody_simulation(masses, positions, velocities, G, dt, T, method="improved_euler",
+                         solver="direct", theta=0.5, softening=0.0, output_path=None, record_every=1):
+    # states come back flat, one row per record laid out per body as [position, velocity]
+    masses = np.asarray(masses, dtype=float)
+    positions = np.asarray(positions, dtype=float)
+    state = pack_state(positions, np.asarray(velocities, dtype=float))
+    deriv_args = (G, masses, solver, theta, softening)
+    return integrate_system(state, dt, T, calculate_nbody_derivatives, deriv_args, method,
+                            output_path, record_every, dim=positions.shape[1],
+                            accel_func=calculate_nbody_accelerations)
+
+
+def run_simulation(params, initial_state, method="improved_euler", output_path=None, record_every=1,
+                   model="earth_moon"):
     G, Ms, Mz, Mk = params['G'], params['Ms'], params['Mz'], params['Mk']
     dt, T = params['dt'], params['T']
     print("Running simulation...")
-    times, states = simulation_loop(initial_state, 0.0, dt, T, calculate_gravitational_derivatives, G, Ms, Mz, Mk)
+    if model == "earth_moon":
+        times, states = integrate_system(initial_state, dt, T, calculate_gravitational_derivatives,
+                                         (G, Ms, Mz, Mk), method, output_path, record_every,
+                                         accel_func=calculate_gravitational_accelerations)
+    elif model == "nbody":
+        masses, state = add_sun_to_state(params, initial_state)
+        times, states = integrate_system(state, dt, T, calculate_nbody_derivatives, (G, masses),
+                                         method, output_path, record_every,
+                                         accel_func=calculate_nbody_accelerations)
+    else:
+        raise ValueError(f"Unknown model '{model}', expected one of {MODELS}")
     print("Simulation complete.")
     return times, states
 
@@ -136,8 +285,17 @@ def extract_trajectories(states_array):
     return earth_x, earth_y, moon_x, moon_y
 
 
+def plot_slice(n_points, start=0):
+    # large or memory-mapped trajectories are decimated so plotting only touches the rows it draws;
+    # the offset keeps the final point in the selection
+    step = max(1, (n_points - start) // MAX_PLOT_POINTS)
+    return slice(start + (n_points - start - 1) % step, None, step)
+
+
 def plot_full_view(params, earth_x, earth_y, moon_x, moon_y):
     a_scala = 170
+    rows = plot_slice(len(earth_x))
+    earth_x, earth_y, moon_x, moon_y = earth_x[rows], earth_y[rows], moon_x[rows], moon_y[rows]
     plt.figure(figsize=(10, 10))
     plt.plot(0, 0, 'yo', markersize=15, label='Sun')
     plt.plot(earth_x, earth_y, 'b-', label="Earth's Path", linewidth=1)
@@ -165,9 +323,9 @@ def plot_zoomed_view(params, earth_x, earth_y, moon_x, moon_y):
     zoom_radius = params['R_ZK'] * 5
     num_total_points = len(earth_x)
     num_zoom_points = max(10, num_total_points // 12)
-    start_index = -num_zoom_points
-    plt.plot(earth_x[start_index:], earth_y[start_index:], 'b-', label="Earth's Path (Zoomed)", linewidth=1)
-    plt.plot(moon_x[start_index:], moon_y[start_index:], 'grey', label="Moon's Path (Zoomed)", linewidth=1)
+    zoom = plot_slice(num_total_points, num_total_points - num_zoom_points)
+    plt.plot(earth_x[zoom], earth_y[zoom], 'b-', label="Earth's Path (Zoomed)", linewidth=1)
+    plt.plot(moon_x[zoom], moon_y[zoom], 'grey', label="Moon's Path (Zoomed)", linewidth=1)
     plt.plot(final_earth_x, final_earth_y, 'bo', markersize=10, label='Earth (Final)')
     plt.plot(moon_x[-1], moon_y[-1], 'ko', markersize=6, label='Moon (Final)')
     plt.plot(0, 0, 'yo', markersize=5, label='Sun (Likely off-screen)')
@@ -184,8 +342,9 @@ def plot_zoomed_view(params, earth_x, earth_y, moon_x, moon_y):
 
 def plot_moon_relative_view(params, earth_x, earth_y, moon_x, moon_y):
     plt.figure(figsize=(8, 8))
-    rel_x = moon_x - earth_x
-    rel_y = moon_y - earth_y
+    rows = plot_slice(len(earth_x))
+    rel_x = moon_x[rows] - earth_x[rows]
+    rel_y = moon_y[rows] - earth_y[rows]
     plt.plot(0, 0, 'bo', markersize=10, label='Earth (Origin)')
     plt.plot(rel_x, rel_y, 'grey', label="Moon's Orbit around Earth", linewidth=1)
     plt.plot(rel_x[-1], rel_y[-1], 'ko', markersize=5, label='Moon (Final Relative Position)')
@@ -209,10 +368,14 @@ def plot_system_trajectories(params, earth_x, earth_y, moon_x, moon_y):
 
 def main():
     sim_params = get_simulation_parameters(DEFAULT_VALUES)
+    method = input_choice("Integration method", INTEGRATION_METHODS, INTEGRATION_METHODS[0])
+    model = input_choice("Gravity model", MODELS, MODELS[0])
+    output_path = input("Stream trajectory to .npy file (leave blank to keep in memory): ").strip() or None
     init_state = calculate_initial_positions_velocities(sim_params)
-    sim_times, states_history = run_simulation(sim_params, init_state)
+    sim_times, states_history = run_simulation(sim_params, init_state, method, output_path, model=model)
     earth_x, earth_y, moon_x, moon_y = extract_trajectories(states_history)
     plot_system_trajectories(sim_params, earth_x, earth_y, moon_x, moon_y)
 
 
-main()
+if __name__ == "__main__":
+    main()
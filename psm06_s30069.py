@@ -3,6 +3,8 @@ import matplotlib.pyplot as plt
 from math import pi
 import time
 
+from shared_results import SharedAllocator, attach_array
+
 
 class WaveParams:
     def __init__(self, length, segments, speed, dt, t_end, amp):
@@ -33,32 +35,80 @@ class StepData:
         self.et = et
 
 
+class WaveHistory:
+    # energies (and their times) every energy_every steps;
+    # displacement/velocity snapshots every snapshot_every steps
+    def __init__(self, steps, points, snapshot_every=1, energy_every=1, alloc=np.empty):
+        n_energies = steps // energy_every + 1
+        n_snapshots = steps // snapshot_every + 1
+        self.wrap(alloc((4, n_energies)), alloc(n_snapshots), alloc((2, n_snapshots, points)),
+                  snapshot_every, energy_every)
+
+    def wrap(self, energies, snapshot_time, fields, snapshot_every, energy_every):
+        self.snapshot_every = snapshot_every
+        self.energy_every = energy_every
+        self.energies = energies
+        self.time, self.ek, self.ep, self.et = energies
+        self.snapshot_time = snapshot_time
+        self.fields = fields
+        self.disp, self.vel = fields
+
+    @classmethod
+    def attach(cls, handles, snapshot_every, energy_every):
+        # rebuild a history from shared arrays written by another process, without copying
+        history = cls.__new__(cls)
+        history.wrap(*(attach_array(h) for h in handles), snapshot_every, energy_every)
+        return history
+
+    def record(self, step, state):
+        if step % self.energy_every == 0:
+            k = step // self.energy_every
+            self.time[k] = state.time
+            self.ek[k], self.ep[k], self.et[k] = state.ek, state.ep, state.et
+        if step % self.snapshot_every == 0:
+            k = step // self.snapshot_every
+            self.snapshot_time[k] = state.time
+            self.disp[k] = state.disp
+            self.vel[k] = state.vel
+
+
+class MidpointBuffers:
+    def __init__(self, n):
+        self.accel = np.zeros(n)
+        self.disp_mid = np.empty(n)
+        self.vel_mid = np.empty(n)
+
+
 def init_wave(params):
     n = params.points()
     dx = params.spacing()
     disp = np.zeros(n)
     vel = np.zeros(n)
-    for i in range(1, params.segments):
-        x = i * dx
-        disp[i] = params.amp * np.sin(pi * x / params.length)
+    x = np.arange(1, params.segments) * dx
+    disp[1:-1] = params.amp * np.sin(pi * x / params.length)
     ek, ep, et = compute_energies(disp, vel, params)
     return StepData(0.0, disp, vel, ek, ep, et)
 
 
-def compute_accel(disp, params):
-    n = params.points()
-    a = np.zeros(n)
-    dx2 = params.spacing() ** 2
-    c2 = params.speed_sq()
-    for i in range(1, params.segments):
-        a[i] = c2 * (disp[i - 1] - 2 * disp[i] + disp[i + 1]) / dx2
-    return a
+def compute_accel(disp, params, out=None):
+    # fixed ends: out[0] and out[-1] stay zero
+    if out is None:
+        out = np.zeros(params.points())
+    inner = out[1:-1]
+    np.add(disp[:-2], disp[2:], out=inner)
+    inner -= disp[1:-1]
+    inner -= disp[1:-1]
+    inner *= params.speed_sq() / params.spacing() ** 2
+    return out
 
 
-def compute_energies(disp, vel, params):
+def compute_energies(disp, vel, params, scratch=None):
+    # dot products reduce each field in a single pass; scratch (>= points - 1 long) avoids
+    # allocating the strain array
     dx = params.spacing()
-    ke = np.sum(0.5 * dx * vel ** 2)
-    pe = np.sum((disp[1:] - disp[:-1]) ** 2) / (2 * dx)
+    strain = np.subtract(disp[1:], disp[:-1], out=None if scratch is None else scratch[:len(disp) - 1])
+    ke = 0.5 * dx * np.dot(vel, vel)
+    pe = np.dot(strain, strain) / (2 * dx)
     return ke, pe, ke + pe
 
 
@@ -74,16 +124,61 @@ def midpoint_integrate(state, params):
     return StepData(state.time + dt, disp_new, vel_new, ek, ep, et)
 
 
-def record_history(params):
+def midpoint_integrate_inplace(state, params, buffers, energies=True):
+    # same update as midpoint_integrate, but advances state.disp/state.vel in place;
+    # with energies=False the energy diagnostics are skipped and left as NaN
+    dt = params.dt
+    accel, disp_mid, vel_mid = buffers.accel, buffers.disp_mid, buffers.vel_mid
+    compute_accel(state.disp, params, accel)
+    np.multiply(state.vel, dt / 2, out=disp_mid)
+    disp_mid += state.disp
+    np.multiply(accel, dt / 2, out=vel_mid)
+    vel_mid += state.vel
+    compute_accel(disp_mid, params, accel)
+    vel_mid *= dt
+    state.disp += vel_mid
+    accel *= dt
+    state.vel += accel
+    state.time += dt
+    if energies:
+        state.ek, state.ep, state.et = compute_energies(state.disp, state.vel, params, disp_mid)
+    else:
+        state.ek = state.ep = state.et = np.nan
+    return state
+
+
+def record_history(params, snapshot_every=1, energy_every=1, alloc=np.empty):
     state = init_wave(params)
-    history = [state]
     steps = int(np.ceil(params.t_end / params.dt))
-    for _ in range(steps):
-        state = midpoint_integrate(state, params)
-        history.append(state)
+    history = WaveHistory(steps, params.points(), snapshot_every, energy_every, alloc)
+    buffers = MidpointBuffers(params.points())
+    history.record(0, state)
+    for i in range(1, steps + 1):
+        midpoint_integrate_inplace(state, params, buffers, energies=i % energy_every == 0)
+        history.record(i, state)
     return history
 
 
+def record_history_shared(params, snapshot_every=1, energy_every=1, directory=None):
+    # worker entry point: the history lives in shared memory; the returned tuple is what
+    # WaveHistory.attach needs in the parent
+    alloc = SharedAllocator(directory)
+    record_history(params, snapshot_every, energy_every, alloc)
+    alloc.close()
+    return alloc.handles, snapshot_every, energy_every
+
+
+def simulate_final_state(params):
+    # no history and no per-step diagnostics; energies are evaluated once at the end
+    state = init_wave(params)
+    steps = int(np.ceil(params.t_end / params.dt))
+    buffers = MidpointBuffers(params.points())
+    for _ in range(steps):
+        midpoint_integrate_inplace(state, params, buffers, energies=False)
+    state.ek, state.ep, state.et = compute_energies(state.disp, state.vel, params)
+    return state
+
+
 def display_params(params):
     dx = params.spacing()
     cfl = params.speed * params.dt / dx
@@ -94,22 +189,18 @@ def display_params(params):
         print("Warning: CFL>1 unstable")
 
 
-def time_simulation(params):
+def time_simulation(params, snapshot_every=1, energy_every=1):
     start = time.time()
-    hist = record_history(params)
+    hist = record_history(params, snapshot_every, energy_every)
     print(f"Sim time: {time.time() - start:.2f}s")
     return hist
 
 
 def plot_wave_energy(history):
-    t = [s.time for s in history]
-    ke = [s.ek for s in history]
-    pe = [s.ep for s in history]
-    te = [s.et for s in history]
     plt.figure()
-    plt.plot(t, ke, label='KE')
-    plt.plot(t, pe, label='PE')
-    plt.plot(t, te, label='TE')
+    plt.plot(history.time, history.ek, label='KE')
+    plt.plot(history.time, history.ep, label='PE')
+    plt.plot(history.time, history.et, label='TE')
     plt.xlabel('t (s)')
     plt.ylabel('Energy')
     plt.legend()
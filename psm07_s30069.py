@@ -1,3 +1,9 @@
+import multiprocessing as mp
+import sys
+import threading
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.colors import LinearSegmentedColormap
@@ -13,18 +19,359 @@ def create_thermal_cmap(colors: list[str | tuple[float, float, float]]) -> Linea
     return LinearSegmentedColormap.from_list("thermal", list(zip(stops, rgb_list)))
 
 
+RELAXATION_METHODS = ("jacobi", "gauss_seidel", "sor")
+
+
+def optimal_sor_omega(shape: tuple[int, int]) -> float:
+    height, width = shape
+    rho = 0.5 * (np.cos(np.pi / max(height - 1, 1)) + np.cos(np.pi / max(width - 1, 1)))
+    return 2.0 / (1.0 + np.sqrt(1.0 - rho ** 2))
+
+
+def jacobi_sweep(src: np.ndarray, dst: np.ndarray) -> None:
+    inner = dst[1:-1, 1:-1]
+    np.add(src[:-2, 1:-1], src[2:, 1:-1], out=inner)
+    inner += src[1:-1, :-2]
+    inner += src[1:-1, 2:]
+    inner *= 0.25
+
+
+def max_abs_change(a: np.ndarray, b: np.ndarray, scratch: np.ndarray) -> float:
+    np.subtract(a[1:-1, 1:-1], b[1:-1, 1:-1], out=scratch)
+    np.abs(scratch, out=scratch)
+    return float(scratch.max()) if scratch.size else 0.0
+
+
+def red_black_slices(shape: tuple[int, int], row_offset: int = 0) -> list[tuple[slice, ...]]:
+    # (center, north, south, west, east) views for the four interior sub-lattices,
+    # red ones ((i + j) even) first so a sweep updates all red points, then all black;
+    # row_offset is the global index of row 0 when the grid is a strip of a larger one
+    h, w = shape
+    origins = ((1, 1), (2, 2), (1, 2), (2, 1))
+    if row_offset % 2:
+        origins = origins[2:] + origins[:2]
+    lattices = []
+    for r0, c0 in origins:
+        lattices.append((
+            (slice(r0, h - 1, 2), slice(c0, w - 1, 2)),
+            (slice(r0 - 1, h - 2, 2), slice(c0, w - 1, 2)),
+            (slice(r0 + 1, h, 2), slice(c0, w - 1, 2)),
+            (slice(r0, h - 1, 2), slice(c0 - 1, w - 2, 2)),
+            (slice(r0, h - 1, 2), slice(c0 + 1, w, 2)),
+        ))
+    return lattices
+
+
+def red_black_sweep(
+        grid: np.ndarray,
+        omega: float,
+        lattices: list[tuple[slice, ...]],
+        scratch: list[np.ndarray],
+        track_change: bool = False
+) -> float:
+    change = 0.0
+    for (center, north, south, west, east), buf in zip(lattices, scratch):
+        if buf.size == 0:
+            continue
+        np.add(grid[north], grid[south], out=buf)
+        buf += grid[west]
+        buf += grid[east]
+        buf *= 0.25
+        buf -= grid[center]
+        buf *= omega
+        grid[center] += buf
+        if track_change:
+            np.abs(buf, out=buf)
+            change = max(change, float(buf.max()))
+    return change
+
+
 def relax_to_convergence(
         grid: np.ndarray,
         max_iter: int = 5000,
-        tol: float = 1e-4
+        tol: float = 1e-4,
+        method: str = "jacobi",
+        omega: float | None = None,
+        check_every: int = 1,
+        workers: int = 1
+) -> np.ndarray:
+    if method not in RELAXATION_METHODS:
+        raise ValueError(f"Unknown relaxation method '{method}', expected one of {RELAXATION_METHODS}")
+    check_every = max(1, int(check_every))
+    if method == "gauss_seidel":
+        omega = 1.0
+    elif method == "sor" and omega is None:
+        omega = optimal_sor_omega(grid.shape)
+    if workers > 1 and grid.shape[0] > 3:
+        return parallel_relax(grid, max_iter, tol, method, omega, check_every, workers)
+
+    if method == "jacobi":
+        # double buffer: each sweep reads one grid and writes the other, then they swap
+        src, dst = grid, grid.copy()
+        scratch = np.empty((grid.shape[0] - 2, grid.shape[1] - 2))
+        for i in range(1, max_iter + 1):
+            jacobi_sweep(src, dst)
+            src, dst = dst, src
+            if i % check_every == 0 and max_abs_change(src, dst, scratch) < tol:
+                break
+        if src is not grid:
+            grid[1:-1, 1:-1] = src[1:-1, 1:-1]
+        return grid
+
+    lattices = red_black_slices(grid.shape)
+    scratch = [np.empty(grid[center].shape) for center, *_ in lattices]
+    for i in range(1, max_iter + 1):
+        check = i % check_every == 0
+        change = red_black_sweep(grid, omega, lattices, scratch, track_change=check)
+        if check and change < tol:
+            break
+    return grid
+
+
+def relax_strip_worker(
+        buffer_names: list[str],
+        shape: tuple[int, int],
+        rows: tuple[int, int],
+        method: str,
+        omega: float | None,
+        max_iter: int,
+        tol: float,
+        check_every: int,
+        barrier,
+        residuals,
+        index: int
+) -> None:
+    # relaxes interior rows [start, stop) of the shared grid; the strip view carries one
+    # halo row on each side, which neighbouring workers write between barriers
+    try:
+        relax_strip(buffer_names, shape, rows, method, omega, max_iter, tol, check_every, barrier,
+                    residuals, index)
+    except threading.BrokenBarrierError:
+        # another worker failed; its own error is what gets reported
+        sys.exit(1)
+    except BaseException:
+        # wake the workers waiting at the barrier instead of leaving them blocked forever
+        barrier.abort()
+        raise
+
+
+def relax_strip(
+        buffer_names: list[str],
+        shape: tuple[int, int],
+        rows: tuple[int, int],
+        method: str,
+        omega: float | None,
+        max_iter: int,
+        tol: float,
+        check_every: int,
+        barrier,
+        residuals,
+        index: int
+) -> None:
+    blocks = [shared_memory.SharedMemory(name=name) for name in buffer_names]
+    try:
+        buffers = [np.ndarray(shape, dtype=float, buffer=block.buf) for block in blocks]
+        start, stop = rows
+        strips = [buf[start - 1:stop + 1] for buf in buffers]
+        if method == "jacobi":
+            src, dst = strips
+            scratch = np.empty((stop - start, shape[1] - 2))
+        else:
+            lattices = red_black_slices(strips[0].shape, row_offset=start - 1)
+            scratch = [np.empty(strips[0][center].shape) for center, *_ in lattices]
+        for i in range(1, max_iter + 1):
+            check = i % check_every == 0
+            if method == "jacobi":
+                jacobi_sweep(src, dst)
+                src, dst = dst, src
+                barrier.wait()
+                change = max_abs_change(src, dst, scratch) if check else 0.0
+            else:
+                change = red_black_sweep(strips[0], omega, lattices[:2], scratch[:2], track_change=check)
+                barrier.wait()
+                change = max(change, red_black_sweep(strips[0], omega, lattices[2:], scratch[2:],
+                                                     track_change=check))
+                barrier.wait()
+            if check:
+                residuals[index] = change
+                barrier.wait()
+                if max(residuals) < tol:
+                    break
+        if method == "jacobi" and src is not strips[0]:
+            strips[0][1:-1] = src[1:-1]
+    finally:
+        for block in blocks:
+            block.close()
+
+
+def parallel_relax(
+        grid: np.ndarray,
+        max_iter: int,
+        tol: float,
+        method: str,
+        omega: float | None,
+        check_every: int,
+        workers: int
+) -> np.ndarray:
+    interior = grid.shape[0] - 2
+    workers = min(workers, interior)
+    bounds = np.linspace(1, interior + 1, workers + 1).astype(int)
+    n_buffers = 2 if method == "jacobi" else 1
+    blocks = [shared_memory.SharedMemory(create=True, size=grid.nbytes) for _ in range(n_buffers)]
+    try:
+        for block in blocks:
+            np.ndarray(grid.shape, dtype=float, buffer=block.buf)[...] = grid
+        barrier = mp.Barrier(workers)
+        residuals = mp.Array("d", workers, lock=False)
+        procs = [
+            mp.Process(target=relax_strip_worker, args=(
+                [block.name for block in blocks], grid.shape, (bounds[k], bounds[k + 1]),
+                method, omega, max_iter, tol, check_every, barrier, residuals, k
+            ))
+            for k in range(workers)
+        ]
+        for proc in procs:
+            proc.start()
+        running = list(procs)
+        while running:
+            finished = wait([proc.sentinel for proc in running])
+            for proc in [proc for proc in running if proc.sentinel in finished]:
+                proc.join()
+                running.remove(proc)
+                if proc.exitcode != 0:
+                    # covers workers killed before they could abort the barrier themselves
+                    barrier.abort()
+        if any(proc.exitcode != 0 for proc in procs):
+            raise RuntimeError("Relaxation worker process failed")
+        grid[...] = np.ndarray(grid.shape, dtype=float, buffer=blocks[0].buf)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return grid
+
+
+STEADY_STATE_METHODS = RELAXATION_METHODS + ("multigrid",)
+COARSEST_SIZE = 5
+COARSEST_SWEEPS = 50
+
+
+def interpolation_weights(n_from: int, n_to: int) -> tuple[np.ndarray, np.ndarray]:
+    pos = np.linspace(0.0, n_from - 1, n_to)
+    lo = np.minimum(pos.astype(int), n_from - 2)
+    return lo, pos - lo
+
+
+def interpolate(u: np.ndarray, shape: tuple[int, int]) -> np.ndarray:
+    # bilinear resampling between node-centred grids that share the same corners
+    lo, frac = interpolation_weights(u.shape[0], shape[0])
+    u = u[lo] * (1 - frac)[:, None] + u[lo + 1] * frac[:, None]
+    lo, frac = interpolation_weights(u.shape[1], shape[1])
+    return u[:, lo] * (1 - frac) + u[:, lo + 1] * frac
+
+
+def restrict(r: np.ndarray, shape: tuple[int, int]) -> np.ndarray:
+    # transpose of interpolate(., r.shape), normalised so constants are preserved
+    lo, frac = interpolation_weights(shape[0], r.shape[0])
+    rows = np.zeros((shape[0], r.shape[1]))
+    np.add.at(rows, lo, (1 - frac)[:, None] * r)
+    np.add.at(rows, lo + 1, frac[:, None] * r)
+    rows /= (np.bincount(lo, 1 - frac, shape[0]) + np.bincount(lo + 1, frac, shape[0]))[:, None]
+    lo, frac = interpolation_weights(shape[1], r.shape[1])
+    out = np.zeros(shape)
+    np.add.at(out.T, lo, (1 - frac)[:, None] * rows.T)
+    np.add.at(out.T, lo + 1, frac[:, None] * rows.T)
+    out /= np.bincount(lo, 1 - frac, shape[1]) + np.bincount(lo + 1, frac, shape[1])
+    return out
+
+
+def build_multigrid_levels(shape: tuple[int, int]) -> list[tuple]:
+    # each level: (shape, 1/hx^2, 1/hy^2, red-black lattices); finest grid has unit spacing
+    h, w = shape
+    hx = hy = 1.0
+    levels = [((h, w), 1.0, 1.0, red_black_slices((h, w)))]
+    while max(h, w) > COARSEST_SIZE:
+        hc = h if h <= 3 else (h + 1) // 2
+        wc = w if w <= 3 else (w + 1) // 2
+        hy *= (h - 1) / (hc - 1)
+        hx *= (w - 1) / (wc - 1)
+        h, w = hc, wc
+        levels.append(((h, w), 1.0 / hx ** 2, 1.0 / hy ** 2, red_black_slices((h, w))))
+    return levels
+
+
+def smooth_poisson(
+        u: np.ndarray,
+        f: np.ndarray,
+        cx: float,
+        cy: float,
+        lattices: list[tuple[slice, ...]],
+        sweeps: int
+) -> None:
+    diag = 2.0 * (cx + cy)
+    for _ in range(sweeps):
+        for center, north, south, west, east in lattices:
+            u[center] = (cx * (u[west] + u[east]) + cy * (u[north] + u[south]) + f[center]) / diag
+
+
+def poisson_residual(u: np.ndarray, f: np.ndarray, cx: float, cy: float) -> np.ndarray:
+    r = np.zeros_like(u)
+    inner = u[1:-1, 1:-1]
+    r[1:-1, 1:-1] = f[1:-1, 1:-1] - (
+            cx * (2 * inner - u[1:-1, :-2] - u[1:-1, 2:]) +
+            cy * (2 * inner - u[:-2, 1:-1] - u[2:, 1:-1])
+    )
+    return r
+
+
+def v_cycle(
+        u: np.ndarray,
+        f: np.ndarray,
+        levels: list[tuple],
+        level: int = 0,
+        pre_sweeps: int = 2,
+        post_sweeps: int = 2
+) -> None:
+    shape, cx, cy, lattices = levels[level]
+    if level == len(levels) - 1:
+        smooth_poisson(u, f, cx, cy, lattices, COARSEST_SWEEPS)
+        return
+    smooth_poisson(u, f, cx, cy, lattices, pre_sweeps)
+    coarse_f = restrict(poisson_residual(u, f, cx, cy), levels[level + 1][0])
+    coarse_e = np.zeros_like(coarse_f)
+    v_cycle(coarse_e, coarse_f, levels, level + 1, pre_sweeps, post_sweeps)
+    u[1:-1, 1:-1] += interpolate(coarse_e, shape)[1:-1, 1:-1]
+    smooth_poisson(u, f, cx, cy, lattices, post_sweeps)
+
+
+def full_multigrid(grid: np.ndarray, levels: list[tuple], level: int = 0, **cycle_options) -> None:
+    # solve on the coarser grid first (boundaries resampled from this one) and use it as the initial guess
+    shape, cx, cy, lattices = levels[level]
+    if level < len(levels) - 1:
+        coarse = interpolate(grid, levels[level + 1][0])
+        full_multigrid(coarse, levels, level + 1, **cycle_options)
+        grid[1:-1, 1:-1] = interpolate(coarse, shape)[1:-1, 1:-1]
+    v_cycle(grid, np.zeros_like(grid), levels, level, **cycle_options)
+
+
+def multigrid_solve(
+        grid: np.ndarray,
+        max_cycles: int = 50,
+        tol: float = 1e-4,
+        full: bool = True,
+        pre_sweeps: int = 2,
+        post_sweeps: int = 2
 ) -> np.ndarray:
-    for _ in range(max_iter):
-        old = grid.copy()
-        grid[1:-1, 1:-1] = 0.25 * (
-                old[:-2, 1:-1] + old[2:, 1:-1] +
-                old[1:-1, :-2] + old[1:-1, 2:]
-        )
-        if np.max(np.abs(grid - old)) < tol:
+    levels = build_multigrid_levels(grid.shape)
+    rhs = np.zeros_like(grid)
+    if full:
+        full_multigrid(grid, levels, pre_sweeps=pre_sweeps, post_sweeps=post_sweeps)
+    previous = np.empty((grid.shape[0] - 2, grid.shape[1] - 2))
+    for _ in range(max_cycles):
+        previous[...] = grid[1:-1, 1:-1]
+        v_cycle(grid, rhs, levels, pre_sweeps=pre_sweeps, post_sweeps=post_sweeps)
+        np.subtract(grid[1:-1, 1:-1], previous, out=previous)
+        if previous.size == 0 or np.abs(previous, out=previous).max() < tol:
             break
     return grid
 
@@ -36,7 +383,11 @@ def compute_steady_state_temperature(
         right_temp: float,
         bottom_temp: float,
         left_temp: float,
+        method: str = "jacobi",
+        **solver_options
 ) -> np.ndarray:
+    if method not in STEADY_STATE_METHODS:
+        raise ValueError(f"Unknown steady-state method '{method}', expected one of {STEADY_STATE_METHODS}")
     grid = np.zeros((height, width), float)
     grid[0, 1:-1] = bottom_temp
     grid[-1, 1:-1] = top_temp
@@ -48,7 +399,9 @@ def compute_steady_state_temperature(
     grid[-1, -1] = (top_temp + right_temp) / 2
     avg = (top_temp + right_temp + bottom_temp + left_temp) / 4
     grid[1:-1, 1:-1] = avg
-    return relax_to_convergence(grid)
+    if method == "multigrid":
+        return multigrid_solve(grid, **solver_options)
+    return relax_to_convergence(grid, method=method, **solver_options)
 
 
 def display_temperature_map(
@@ -76,7 +429,8 @@ def main():
 
     print(f"Computing temperature on {grid_w}×{grid_h} grid...")
     temp_grid = compute_steady_state_temperature(
-        grid_w, grid_h, top_T, right_T, bottom_T, left_T
+        grid_w, grid_h, top_T, right_T, bottom_T, left_T,
+        method="sor", check_every=10
     )
 
     cmap = create_thermal_cmap(["66CC66", "FFFF00", "FF0000"])
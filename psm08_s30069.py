@@ -2,6 +2,9 @@ import warnings
 import matplotlib.pyplot as plt
 import numpy as np
 
+from adaptive_rk import dormand_prince
+from shared_results import SharedAllocator
+
 
 def lorenz_derivative(state, A, B, C):
     x, y, z = state
@@ -31,9 +34,8 @@ def rk4_step(state, dt, A, B, C):
     return state + (dt / 6.0) * (k1 + 2 * k2 + 2 * k3 + k4)
 
 
-def simulate(method, initial, dt, steps, A, B, C):
-    x = np.empty(steps + 1)
-    z = np.empty(steps + 1)
+def simulate(method, initial, dt, steps, A, B, C, alloc=np.empty):
+    x, z = alloc((2, steps + 1))
     state = np.array(initial, dtype=float)
     x[0], z[0] = state[0], state[2]
 
@@ -48,6 +50,108 @@ def simulate(method, initial, dt, steps, A, B, C):
     return x, z
 
 
+def simulate_shared(method, initial, dt, steps, A, B, C, directory=None):
+    # worker entry point: returns the handle of a shared (2, steps + 1) block holding x and z
+    alloc = SharedAllocator(directory)
+    simulate(method, initial, dt, steps, A, B, C, alloc)
+    alloc.close()
+    return alloc.handles[0]
+
+
+def simulate_adaptive(initial, dt, steps, A, B, C, rtol=1e-8, atol=1e-10):
+    # adaptive RK45 run sampled through dense output on the same grid as simulate()
+    t_samples = dt * np.arange(steps + 1)
+    sol = dormand_prince(lambda t, state: lorenz_derivative(state, A, B, C),
+                         (0.0, t_samples[-1]), initial, rtol=rtol, atol=atol, dense_output=True)
+    print(f"  [rk45] {sol.n_accepted} steps, {sol.n_rejected} rejected")
+    samples = sol(t_samples)
+    return samples[:, 0], samples[:, 2]
+
+
+def lorenz_derivative_ensemble(state, A, B, C, out):
+    # state and out are (3, M); A, B, C are scalars or (M,) arrays. out rows double as scratch.
+    x, y, z = state
+    np.multiply(x, y, out=out[1])
+    np.multiply(z, C, out=out[2])
+    np.subtract(out[1], out[2], out=out[2])
+    np.multiply(x, B, out=out[1])
+    out[1] -= y
+    np.multiply(x, z, out=out[0])
+    out[1] -= out[0]
+    np.subtract(y, x, out=out[0])
+    out[0] *= A
+    return out
+
+
+def euler_step_ensemble(state, dt, A, B, C, work):
+    k1 = lorenz_derivative_ensemble(state, A, B, C, work[0])
+    k1 *= dt
+    state += k1
+    return state
+
+
+def midpoint_step_ensemble(state, dt, A, B, C, work):
+    k1, k2, mid = work[0], work[1], work[4]
+    lorenz_derivative_ensemble(state, A, B, C, k1)
+    np.multiply(k1, 0.5 * dt, out=mid)
+    mid += state
+    lorenz_derivative_ensemble(mid, A, B, C, k2)
+    k2 *= dt
+    state += k2
+    return state
+
+
+def rk4_step_ensemble(state, dt, A, B, C, work):
+    k1, k2, k3, k4, tmp = work
+    lorenz_derivative_ensemble(state, A, B, C, k1)
+    np.multiply(k1, 0.5 * dt, out=tmp)
+    tmp += state
+    lorenz_derivative_ensemble(tmp, A, B, C, k2)
+    np.multiply(k2, 0.5 * dt, out=tmp)
+    tmp += state
+    lorenz_derivative_ensemble(tmp, A, B, C, k3)
+    np.multiply(k3, dt, out=tmp)
+    tmp += state
+    lorenz_derivative_ensemble(tmp, A, B, C, k4)
+    k2 += k3
+    k2 *= 2
+    k1 += k2
+    k1 += k4
+    k1 *= dt / 6.0
+    state += k1
+    return state
+
+
+ENSEMBLE_STEPS = {
+    euler_step: euler_step_ensemble,
+    midpoint_step: midpoint_step_ensemble,
+    rk4_step: rk4_step_ensemble,
+}
+
+
+def simulate_ensemble(method, initials, dt, steps, A, B, C, record_every=1, alloc=np.empty):
+    # initials is (M, 3); A, B, C may be per-member (M,) arrays. Returns x and z sampled
+    # every record_every steps as (n_records, M) arrays (None when record_every == 0)
+    # plus the final (M, 3) states.
+    step = ENSEMBLE_STEPS.get(method, method)
+    state = np.array(initials, dtype=float).T.copy()
+    A, B, C = (np.asarray(p, dtype=float) for p in (A, B, C))
+    work = np.empty((5,) + state.shape)
+
+    x = z = None
+    if record_every:
+        n_records = steps // record_every + 1
+        x, z = alloc((2, n_records, state.shape[1]))
+        x[0], z[0] = state[0], state[2]
+
+    for i in range(1, steps + 1):
+        step(state, dt, A, B, C, work)
+        if record_every and i % record_every == 0:
+            x[i // record_every], z[i // record_every] = state[0], state[2]
+
+    return x, z, state.T.copy()
+
+
 def plot_attractor(x, z, label):
     plt.plot(x, z, lw=0.5, label=label)
 
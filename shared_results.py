@@ -0,0 +1,97 @@
+import os
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# shared-memory blocks mapped by this process, keyed by block name; kept so views stay valid
+open_blocks = {}
+
+
+class SharedArrayHandle:
+    # picklable description of an array living in shared memory (path is None)
+    # or in a memory-mapped .npy file
+    def __init__(self, name, shape, dtype, path=None):
+        self.name = name
+        self.shape = tuple(int(n) for n in np.atleast_1d(shape))
+        self.dtype = np.dtype(dtype).str
+        self.path = path
+
+    def __repr__(self):
+        where = self.path if self.path is not None else f"shm:{self.name}"
+        return f"SharedArrayHandle({where}, shape={self.shape}, dtype={self.dtype})"
+
+
+def share_array(shape, dtype=float, directory=None):
+    # allocate an array other processes can attach to; returns the array and its handle
+    shape = tuple(int(n) for n in np.atleast_1d(shape))
+    dtype = np.dtype(dtype)
+    if directory is not None:
+        path = os.path.join(directory, f"result_{uuid.uuid4().hex}.npy")
+        array = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+        return array, SharedArrayHandle(path, shape, dtype, path)
+    size = max(1, int(np.prod(shape)) * dtype.itemsize)
+    block = shared_memory.SharedMemory(create=True, size=size)
+    open_blocks[block.name] = block
+    array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return array, SharedArrayHandle(block.name, shape, dtype)
+
+
+def attach_array(handle):
+    # NumPy view of a shared array; no data is copied
+    if handle.path is not None:
+        return np.load(handle.path, mmap_mode='r+')
+    block = open_blocks.get(handle.name)
+    if block is None:
+        block = shared_memory.SharedMemory(name=handle.name)
+        open_blocks[handle.name] = block
+    return np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=block.buf)
+
+
+def close_array(handle):
+    # drop this process's mapping; views into it must no longer be in use
+    block = open_blocks.pop(handle.name, None)
+    if block is not None:
+        try:
+            block.close()
+        except BufferError:
+            # views are still alive; the mapping goes away with them
+            pass
+
+
+def disown_array(handle):
+    # stop this process's resource tracker from unlinking the block when the process exits,
+    # so a worker's results outlive it; the attaching parent becomes responsible for release
+    if handle.path is None and os.name == "posix":
+        resource_tracker.unregister("/" + handle.name, "shared_memory")
+
+
+def release_array(handle):
+    # free the underlying storage once nobody needs it any more
+    if handle.path is not None:
+        if os.path.exists(handle.path):
+            os.remove(handle.path)
+        return
+    block = open_blocks.get(handle.name) or shared_memory.SharedMemory(name=handle.name)
+    open_blocks[handle.name] = block
+    block.unlink()
+    close_array(handle)
+
+
+class SharedAllocator:
+    # drop-in for np.empty in simulation code running inside a worker: every array it hands out
+    # lives in shared memory (or a memory-mapped file under directory) and its handle is kept
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.handles = []
+
+    def __call__(self, shape, dtype=float):
+        array, handle = share_array(shape, dtype, self.directory)
+        self.handles.append(handle)
+        return array
+
+    def close(self):
+        # called by the worker once the results are written
+        for handle in self.handles:
+            disown_array(handle)
+            close_array(handle)